@@ -0,0 +1,47 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from api import metrics
+
+_lock = threading.Lock()
+_tables = {}
+
+
+def file_version(path):
+    """Cheap version token for a data file, changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def load_table(path, prepare=None, **read_csv_kwargs):
+    """Load a CSV once and keep it in memory until the file changes on disk.
+
+    ``prepare`` is applied to the freshly read frame and its result is what
+    gets cached, so derived columns are also computed only once per version.
+    Returns ``(version, value)``.
+    """
+    version = file_version(path)
+    cached = _tables.get(path)
+    if cached is not None and cached[0] == version:
+        metrics.count("table", "hit")
+        return cached
+
+    with _lock:
+        cached = _tables.get(path)
+        if cached is not None and cached[0] == version:
+            metrics.count("table", "hit")
+            return cached
+
+        metrics.count("table", "miss")
+        with metrics.span("load"):
+            df = pd.read_csv(path, **read_csv_kwargs)
+            # Replace infinite values with NaN
+            df = df.replace([np.inf, -np.inf], np.nan)
+            value = prepare(df) if prepare is not None else df
+
+        cached = (version, value)
+        _tables[path] = cached
+        return cached
@@ -0,0 +1,57 @@
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import Response
+
+from api import metrics
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+BINARY_MEDIA_TYPES = (ARROW_STREAM, PARQUET)
+
+
+def negotiate(accept_header):
+    """Pick the binary table format requested in an Accept header, or None for JSON.
+
+    Media types are ranked by their q value; JSON wins ties so that browsers
+    and clients sending ``*/*`` keep getting the JSON response.
+    """
+    best, best_q = None, 0.0
+    for part in (accept_header or "").split(","):
+        fields = [field.strip() for field in part.split(";")]
+        media_type = fields[0].lower()
+        q = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in BINARY_MEDIA_TYPES and q > best_q:
+            best, best_q = media_type, q
+        elif media_type in ("application/json", "*/*", "application/*") and q >= best_q:
+            best, best_q = None, q
+    return best
+
+
+def to_arrow(df):
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def serialize(df, media_type):
+    with metrics.span("serialize"):
+        table = to_arrow(df)
+        if media_type == PARQUET:
+            buffer = io.BytesIO()
+            pq.write_table(table, buffer)
+            return buffer.getvalue()
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+
+def table_response(df, media_type, headers=None):
+    return Response(content=serialize(df, media_type), media_type=media_type, headers=headers)
@@ -0,0 +1,25 @@
+import hashlib
+
+from fastapi import Response
+
+from api import metrics
+
+
+def etag_for(version, request):
+    """Weak ETag for a response derived from data ``version``.
+
+    The query string and Accept header are part of the tag, since they select
+    a different slice or encoding of the same data.
+    """
+    key = f"{version}|{request.url.query}|{request.headers.get('accept', '')}"
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+
+
+def not_modified(request, etag):
+    """304 response if the client's If-None-Match already holds ``etag``, else None."""
+    candidates = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in candidates or "*" in candidates:
+        metrics.count("etag", "hit")
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+    metrics.count("etag", "miss")
+    return None
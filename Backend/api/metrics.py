@@ -0,0 +1,117 @@
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+router = APIRouter()
+
+# tracemalloc gives per-stage allocation peaks but slows allocation-heavy code, so it is opt-in
+TRACE_MEMORY = os.environ.get("METRICS_TRACE_MEMORY", "0") == "1"
+if TRACE_MEMORY:
+    tracemalloc.start()
+
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+
+
+def _max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _rss_bytes():
+    # current resident set size; fall back to the peak where /proc is not available
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return _max_rss_bytes()
+
+
+def observe(stage, seconds, memory=0):
+    """Record one run of ``stage`` timed elsewhere, e.g. a fit reported back by a worker process."""
+    with _lock:
+        stats = _stages.setdefault(stage, {"count": 0, "sum": 0.0, "max": 0.0, "memory": 0})
+        stats["count"] += 1
+        stats["sum"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        stats["memory"] = max(stats["memory"], memory)
+
+
+@contextmanager
+def span(stage):
+    """Time a stage (load, filter, fit, predict, serialize, ...) and record how much memory it added.
+
+    With METRICS_TRACE_MEMORY=1 the growth is the traced allocation peak
+    inside the stage above the allocations alive when it started
+    (approximate when stages overlap across threads); otherwise it is the
+    growth of the resident set between the start and the end of the stage.
+    """
+    if TRACE_MEMORY:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+    else:
+        baseline = _rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        current = tracemalloc.get_traced_memory()[1] if TRACE_MEMORY else _rss_bytes()
+        observe(stage, elapsed, max(current - baseline, 0))
+
+
+def count(name, result, amount=1):
+    """Increment a cache counter, e.g. ``count("llm_table", "hit")``."""
+    with _lock:
+        _counters[(name, result)] = _counters.get((name, result), 0) + amount
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        stages = {stage: dict(stats) for stage, stats in _stages.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP backend_stage_seconds Time spent in each instrumented stage.",
+        "# TYPE backend_stage_seconds summary",
+    ]
+    for stage, stats in sorted(stages.items()):
+        lines.append(f'backend_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        lines.append(f'backend_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+    lines += [
+        "# HELP backend_stage_max_seconds Slowest single run of each stage.",
+        "# TYPE backend_stage_max_seconds gauge",
+    ]
+    lines += [f'backend_stage_max_seconds{{stage="{stage}"}} {stats["max"]:.6f}'
+              for stage, stats in sorted(stages.items())]
+    lines += [
+        "# HELP backend_stage_memory_growth_bytes Largest memory growth within a single run of each stage.",
+        "# TYPE backend_stage_memory_growth_bytes gauge",
+    ]
+    lines += [f'backend_stage_memory_growth_bytes{{stage="{stage}"}} {stats["memory"]}'
+              for stage, stats in sorted(stages.items())]
+    lines += [
+        "# HELP backend_cache_requests_total Cache lookups by cache and result (hit/miss).",
+        "# TYPE backend_cache_requests_total counter",
+    ]
+    lines += [f'backend_cache_requests_total{{cache="{name}",result="{result}"}} {value}'
+              for (name, result), value in sorted(counters.items())]
+    lines += [
+        "# HELP backend_process_max_rss_bytes Peak resident set size of the process.",
+        "# TYPE backend_process_max_rss_bytes gauge",
+        f"backend_process_max_rss_bytes {_max_rss_bytes()}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,194 @@
+import asyncio
+import glob
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+
+from api import metrics
+from api.formats import ARROW_STREAM, negotiate, table_response
+
+router = APIRouter(prefix="/predict")
+
+MODEL_DIR = os.environ.get("MODEL_DIR", "models/artifacts")
+MICROBATCH = os.environ.get("PREDICT_MICROBATCH", "0") == "1"
+MAX_BATCH_SIZE = int(os.environ.get("PREDICT_MAX_BATCH_SIZE", "1024"))
+MAX_WAIT_MS = float(os.environ.get("PREDICT_MAX_WAIT_MS", "5"))
+
+models = {}
+_batchers = {}
+_mtimes = {}
+
+
+def load_models(model_dir=None):
+    """Load every persisted model in ``model_dir``, keyed by file name.
+
+    Files that have not changed since the previous call are not loaded again,
+    so this is cheap enough to call per request: models published while the
+    server runs (e.g. by the dashboard's ``TrainingService.publish``) are
+    served from their next request on.
+
+    Large arrays (e.g. nearest-neighbour indexes) are memory-mapped read-only,
+    so they are paged in on demand and shared by all worker processes.
+    """
+    for path in sorted(glob.glob(os.path.join(model_dir or MODEL_DIR, "*.joblib"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        if _mtimes.get(name) == mtime:
+            continue
+        with metrics.span("load_model"):
+            artifact = joblib.load(path, mmap_mode="r")
+        # training.py and models.selection persist a dict with the fitted model under "model"
+        if isinstance(artifact, dict):
+            artifact = artifact["model"]
+        models[name] = artifact
+        _mtimes[name] = mtime
+    return models
+
+
+def parse_features(body, content_type):
+    """Turn a request body into one feature frame.
+
+    Accepts an Arrow IPC stream, ``{"records": [{...}, ...]}`` with named
+    columns, or ``{"instances": [[...], ...]}`` with positional features.
+    """
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == ARROW_STREAM:
+        return pa.ipc.open_stream(pa.py_buffer(body)).read_all().to_pandas()
+
+    payload = json.loads(body) if body else {}
+    if "records" in payload:
+        return pd.DataFrame.from_records(payload["records"])
+    if "instances" in payload:
+        return pd.DataFrame(np.asarray(payload["instances"]))
+    raise ValueError('Expected "records" or "instances" in the request body')
+
+
+class MicroBatcher:
+    """Coalesces concurrent predict calls into one vectorized ``predict``.
+
+    Requests are queued and flushed either when ``max_batch_size`` rows are
+    waiting or ``max_wait`` seconds after the first request of a batch.
+    """
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_MS / 1000):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    async def predict(self, frame):
+        # frames of different callers are concatenated, so each one must have the model's columns on its own
+        frame = _check_features(self.model, frame)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((frame, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            rows = len(items[0][0])
+            deadline = loop.time() + self.max_wait
+            while rows < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                items.append(item)
+                rows += len(item[0])
+
+            frames = [frame for frame, _ in items]
+            try:
+                predictions = await run_in_threadpool(_timed_predict, self.model, pd.concat(frames, ignore_index=True))
+            except Exception:
+                # predict each request on its own, so the error only reaches the request that caused it
+                for frame, future in items:
+                    try:
+                        result = await run_in_threadpool(_timed_predict, self.model, frame)
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+                continue
+
+            start = 0
+            for frame, future in items:
+                if not future.done():
+                    future.set_result(predictions[start:start + len(frame)])
+                start += len(frame)
+
+
+def _check_features(model, frame):
+    """``frame`` with the columns ``model`` was fitted on, in that order; raises ValueError otherwise."""
+    expected = getattr(model, "feature_names_in_", None)
+    n_features = getattr(model, "n_features_in_", None)
+    positional = isinstance(frame.columns, pd.RangeIndex)
+    if n_features is not None and positional and frame.shape[1] != n_features:
+        raise ValueError(f"Expected {n_features} features, got {frame.shape[1]}")
+    if expected is None:
+        return frame
+    expected = list(expected)
+    if positional:
+        # "instances" bodies carry the features in training order without names
+        return frame.set_axis(expected, axis=1)
+    missing = [column for column in expected if column not in frame.columns]
+    unexpected = [column for column in frame.columns if column not in expected]
+    if missing or unexpected:
+        raise ValueError(f"Feature columns do not match the model: missing {missing}, unexpected {unexpected}")
+    return frame[expected]
+
+
+def _timed_predict(model, frame):
+    with metrics.span("predict"):
+        return model.predict(frame)
+
+
+async def _predict(name, frame):
+    model = models[name]
+    if not MICROBATCH:
+        return await run_in_threadpool(_timed_predict, model, frame)
+    batcher = _batchers.get(name)
+    if batcher is None or batcher.model is not model:
+        batcher = _batchers[name] = MicroBatcher(model)
+    return await batcher.predict(frame)
+
+
+@router.get("")
+def list_models():
+    load_models()
+    return {"models": sorted(models)}
+
+@router.post("/{model_name}")
+async def predict(model_name: str, request: Request):
+    await run_in_threadpool(load_models)
+    if model_name not in models:
+        return {"error": f"Unknown model: {model_name}"}
+
+    try:
+        frame = parse_features(await request.body(), request.headers.get("content-type"))
+        predictions = await _predict(model_name, frame)
+    except Exception as e:
+        return {"error": str(e)}
+
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is not None:
+        return table_response(pd.DataFrame({"prediction": predictions}), media_type)
+
+    return {"predictions": np.asarray(predictions).tolist()}
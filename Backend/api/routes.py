@@ -1,31 +1,98 @@
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
 import pandas as pd
-import numpy as np
+
+from api import metrics
+from api.datasets import load_table
+from api.formats import negotiate, table_response
+from api.http_cache import etag_for, not_modified
 
 router = APIRouter()
 
+LLM_CSV_PATH = "data/llm2024.csv"
+STREAM_CHUNK_ROWS = 1000
+
+
+def _prepare_llm(df):
+    # Parameters holds numbers mixed with "TBA", keep a numeric view for range filters
+    return df, pd.to_numeric(df["Parameters"], errors="coerce")
+
+
+def _iter_ndjson(df, chunk_rows=STREAM_CHUNK_ROWS):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_json(orient="records", lines=True, force_ascii=False)
+
+
 @router.get("/")
 def read_root():
     return {"Hello": "World"}
 
 @router.get("/llm")
-def read_csv():
-    # Path to your CSV file
-    csv_file_path = "data/llm2024.csv"
-
+def read_csv(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    columns: Optional[str] = Query(None, description="Comma separated list of columns to return"),
+    company: Optional[str] = Query(None, alias="Comapany"),
+    arch: Optional[str] = Query(None, alias="Arch"),
+    min_parameters: Optional[float] = None,
+    max_parameters: Optional[float] = None,
+    stream: bool = Query(False, description="Stream rows as NDJSON instead of one JSON document"),
+):
     try:
-        # Read the CSV file using Pandas
-        df = pd.read_csv(csv_file_path, encoding='latin1')
-
-        # Replace infinite values with NaN
-        df = df.replace([np.inf, -np.inf], np.nan)
-
-        # Replace NaN values with None for JSON serialization
-        data = df.where(pd.notnull(df), None).to_dict(orient="records")
-
+        version, (df, parameters) = load_table(LLM_CSV_PATH, prepare=_prepare_llm, encoding='latin1')
     except FileNotFoundError:
         return {"error": "CSV file not found"}
     except Exception as e:
         return {"error": str(e)}
 
-    return {"data": data}
+    # Clients revalidating an unchanged table get a 304 without any filtering or encoding
+    etag = etag_for(version, request)
+    # the body depends on the Accept header (JSON, Arrow or Parquet), so shared caches must key on it too
+    headers = {"ETag": etag, "Vary": "Accept"}
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    with metrics.span("filter"):
+        mask = pd.Series(True, index=df.index)
+        if company is not None:
+            mask &= df["Comapany"].str.lower() == company.lower()
+        if arch is not None:
+            mask &= df["Arch"].str.lower() == arch.lower()
+        if min_parameters is not None:
+            mask &= parameters >= min_parameters
+        if max_parameters is not None:
+            mask &= parameters <= max_parameters
+        if not mask.all():
+            df = df[mask]
+
+    if columns:
+        selected = [column.strip() for column in columns.split(",") if column.strip()]
+        unknown = [column for column in selected if column not in df.columns]
+        if unknown:
+            return {"error": f"Unknown columns: {', '.join(unknown)}"}
+        df = df[selected]
+
+    total = len(df)
+    end = total if limit is None else min(offset + limit, total)
+    page = df.iloc[offset:end]
+
+    if stream:
+        return StreamingResponse(_iter_ndjson(page), media_type="application/x-ndjson", headers=headers)
+
+    # Arrow / Parquet clients skip the JSON encoding and the NaN -> None conversion
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type is not None:
+        return table_response(page, media_type, headers={"X-Total-Count": str(total), **headers})
+
+    # Replace NaN values with None for JSON serialization
+    with metrics.span("serialize"):
+        data = page.astype(object).where(pd.notnull(page), None).to_dict(orient="records")
+    next_offset = end if end < total else None
+    response.headers.update(headers)
+
+    return {"data": data, "total": total, "offset": offset, "next_offset": next_offset}
@@ -1,9 +1,22 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from api.routes import router as api_router
+from api.predict import router as predict_router, load_models
+from api.metrics import router as metrics_router
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the persisted models once so every request reuses them
+    load_models()
+    yield
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(api_router)
+app.include_router(predict_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
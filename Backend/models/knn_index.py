@@ -0,0 +1,179 @@
+"""KNN classifier backed by a persisted nearest-neighbour index.
+
+Low-dimensional features such as LATITUDE/LONGITUDE use an exact KD-tree,
+or a ball tree with ``metric="haversine"`` for great-circle distances on
+[lat, lon] degrees. High-dimensional features use an inverted-file (IVF)
+index: the rows are clustered with k-means and a query only scans the rows
+of its ``n_probe`` nearest clusters, which trades a little recall for far
+fewer distance computations than brute force.
+
+Build the index offline and save it with ``models.selection.save_model``
+(or ``models.selection.search``). ``api.predict.load_models`` loads artifacts
+memory-mapped, so the index arrays are paged in on demand and shared
+between worker processes.
+"""
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.utils.validation import check_array, check_is_fitted
+
+# KD-tree pruning stops paying off beyond roughly this many dimensions
+MAX_TREE_DIMENSIONS = 15
+
+
+class IVFIndex:
+    """Approximate nearest neighbours over k-means clusters ("inverted lists").
+
+    The rows are stored grouped by cluster, so each list is one contiguous
+    slice of ``data``; ``ids`` maps the stored rows back to the input order.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, random_state=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.random_state = random_state
+
+    def fit(self, X):
+        from sklearn.cluster import MiniBatchKMeans
+
+        X = np.ascontiguousarray(X, dtype='float64')
+        n_lists = min(self.n_lists or max(int(np.sqrt(len(X))), 1), len(X))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=4096, n_init=3, random_state=self.random_state)
+        assignments = kmeans.fit_predict(X)
+
+        self.centroids = kmeans.cluster_centers_
+        self.ids = np.argsort(assignments, kind='stable')
+        self.data = X[self.ids]
+        self.offsets = np.searchsorted(assignments[self.ids], np.arange(n_lists + 1))
+        return self
+
+    def query(self, X, k):
+        """``(distances, indices)`` of the ``k`` approximate nearest rows, nearest first.
+
+        The batch is answered list by list: every inverted list is scanned
+        once, with one matrix product against all queries that probe it.
+        """
+        X = np.ascontiguousarray(X, dtype='float64')
+        n_probe = min(self.n_probe, len(self.centroids))
+        probes = np.argpartition(_squared_distances(X, self.centroids), n_probe - 1, axis=1)[:, :n_probe]
+
+        best = np.full((len(X), k), np.inf)
+        best_positions = np.full((len(X), k), -1, dtype='int64')
+        queries = np.repeat(np.arange(len(X)), n_probe)
+        lists = probes.ravel()
+        order = np.argsort(lists, kind='stable')
+        lists, queries = lists[order], queries[order]
+        bounds = np.flatnonzero(np.diff(lists)) + 1
+        for list_queries, j in zip(np.split(queries, bounds), lists[np.r_[0, bounds]] if len(lists) else []):
+            lo, hi = self.offsets[j], self.offsets[j + 1]
+            if lo == hi:
+                continue
+            distances = np.hstack([best[list_queries], _squared_distances(X[list_queries], self.data[lo:hi])])
+            positions = np.hstack([best_positions[list_queries],
+                                   np.broadcast_to(np.arange(lo, hi), (len(list_queries), hi - lo))])
+            keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            best[list_queries] = np.take_along_axis(distances, keep, axis=1)
+            best_positions[list_queries] = np.take_along_axis(positions, keep, axis=1)
+
+        # the probed lists held fewer than k rows together: widen the search for those queries
+        for i in np.flatnonzero((best_positions < 0).any(axis=1)):
+            best[i], best_positions[i] = self._query_one(X[i], k)
+
+        order = np.argsort(best, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_positions = np.take_along_axis(best_positions, order, axis=1)
+        return np.sqrt(best), self.ids[best_positions]
+
+    def _query_one(self, row, k):
+        lists = np.argsort(_squared_distances(row[None, :], self.centroids)[0])
+        n_probe = max(self.n_probe, np.searchsorted(np.cumsum(np.diff(self.offsets)[lists]), k) + 1)
+        positions = np.concatenate([np.arange(self.offsets[j], self.offsets[j + 1]) for j in lists[:n_probe]])
+        distances = _squared_distances(row[None, :], self.data[positions])[0]
+        nearest = np.argpartition(distances, k - 1)[:k]
+        return distances[nearest], positions[nearest]
+
+
+def _squared_distances(A, B):
+    distances = (A * A).sum(axis=1)[:, None] - 2.0 * A @ B.T + (B * B).sum(axis=1)[None, :]
+    return np.maximum(distances, 0.0)
+
+
+class KNNIndexClassifier(ClassifierMixin, BaseEstimator):
+    """Drop-in replacement for ``KNeighborsClassifier`` backed by a KD-tree, ball tree or IVF index.
+
+    ``algorithm="auto"`` picks a ball tree for the haversine metric, a
+    KD-tree up to ``MAX_TREE_DIMENSIONS`` features and IVF above that.
+    Queries are answered in batches of ``batch_size`` rows.
+    """
+
+    def __init__(self, n_neighbors=5, weights="uniform", algorithm="auto", metric="euclidean",
+                 leaf_size=40, n_lists=None, n_probe=8, batch_size=4096, random_state=0):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.algorithm = algorithm
+        self.metric = metric
+        self.leaf_size = leaf_size
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.batch_size = batch_size
+        self.random_state = random_state
+
+    def _points(self, X):
+        X = check_array(X, dtype='float64')
+        # haversine works on [lat, lon] in radians
+        return np.radians(X) if self.metric == "haversine" else X
+
+    def fit(self, X, y):
+        from sklearn.neighbors import BallTree, KDTree
+
+        X = self._points(X)
+        self.classes_, self.labels_ = np.unique(np.asarray(y), return_inverse=True)
+        self.n_features_in_ = X.shape[1]
+
+        algorithm = self.algorithm
+        if algorithm == "auto":
+            if self.metric == "haversine":
+                algorithm = "ball_tree"
+            else:
+                algorithm = "kd_tree" if X.shape[1] <= MAX_TREE_DIMENSIONS else "ivf"
+        if algorithm == "ivf":
+            if self.metric != "euclidean":
+                raise ValueError("the IVF index only supports the euclidean metric")
+            self.index_ = IVFIndex(self.n_lists, self.n_probe, self.random_state).fit(X)
+        elif algorithm == "ball_tree":
+            self.index_ = BallTree(X, leaf_size=self.leaf_size, metric=self.metric)
+        elif algorithm == "kd_tree":
+            self.index_ = KDTree(X, leaf_size=self.leaf_size, metric=self.metric)
+        else:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        self.algorithm_ = algorithm
+        return self
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        check_is_fitted(self, "index_")
+        X = self._points(X)
+        k = min(n_neighbors or self.n_neighbors, len(self.labels_))
+        distances = np.empty((len(X), k))
+        indices = np.empty((len(X), k), dtype='int64')
+        for start in range(0, len(X), self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            distances[batch], indices[batch] = self.index_.query(X[batch], k)
+        return (distances, indices) if return_distance else indices
+
+    def predict_proba(self, X):
+        distances, indices = self.kneighbors(X)
+        labels = self.labels_[indices]
+        if self.weights == "distance":
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / distances
+            # exact matches decide alone, like KNeighborsClassifier
+            exact = np.isinf(weights).any(axis=1)
+            weights[exact] = np.isinf(weights[exact]).astype('float64')
+        else:
+            weights = np.ones_like(distances)
+
+        votes = np.zeros((len(labels), len(self.classes_)))
+        np.add.at(votes, (np.arange(len(labels))[:, None], labels), weights)
+        return votes / votes.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
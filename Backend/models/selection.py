@@ -0,0 +1,260 @@
+"""Parallel hyperparameter search with k-fold cross-validation.
+
+Candidates are scored in a process pool, and every score is cached on disk
+per (dataset version, estimator, params, cv, scoring), so a re-run only fits
+the new candidates. The winner is refitted on all rows and saved to
+``models/artifacts/<name>.joblib``, where ``POST /predict/<name>`` serves it.
+
+Usage from a notebook (run from ``Backend/models/<task>/``)::
+
+    import sys; sys.path.insert(0, "../..")
+    from models.selection import search
+
+    result = search(RandomForestRegressor(random_state=42),
+                    {"n_estimators": [50, 100, 200], "max_depth": [None, 10, 20]},
+                    X, y, name="random_forest", method="halving")
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from api import metrics
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_DIR = os.path.join(MODELS_DIR, "artifacts")
+SEARCH_CACHE_DIR = os.path.join(MODELS_DIR, ".cache", "selection")
+
+
+def dataset_version(X, y):
+    """Content hash of the training data, used to key the score cache."""
+    digest = hashlib.sha256()
+    for values in (X, y):
+        if isinstance(values, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+            digest.update(json.dumps([str(column) for column in getattr(values, "columns", [])]).encode())
+        else:
+            values = np.ascontiguousarray(values)
+            digest.update(f"{values.dtype}{values.shape}".encode())
+            digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def candidates(space, method="grid", n_iter=20, random_state=0):
+    """Parameter dicts to try: the full grid, or ``n_iter`` samples for ``method="random"``.
+
+    For random search the values in ``space`` may also be scipy.stats distributions.
+    """
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+    if method == "random":
+        return list(ParameterSampler(space, n_iter=n_iter, random_state=random_state))
+    return list(ParameterGrid(space))
+
+
+def _key(version, estimator, params, n_samples, cv, scoring, random_state):
+    # the estimator's own settings (e.g. random_state, criterion) change the scores as much as ``params`` do
+    base_params = repr(sorted(estimator.get_params(deep=False).items()))
+    payload = json.dumps([version, type(estimator).__name__, base_params, params, n_samples, cv, scoring,
+                          random_state], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:20]
+
+
+def _dump(value, path):
+    # write next to the target and rename, so readers and other searches never see a partial file
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    joblib.dump(value, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _subsample(X, y, n_samples, random_state):
+    if n_samples is None or n_samples >= len(y):
+        return X, y
+    positions = np.sort(np.random.default_rng(random_state).choice(len(y), n_samples, replace=False))
+    X = X.iloc[positions] if isinstance(X, pd.DataFrame) else np.asarray(X)[positions]
+    y = y.iloc[positions] if isinstance(y, pd.Series) else np.asarray(y)[positions]
+    return X, y
+
+
+def _evaluate(estimator, params, data_path, n_samples, cv, scoring, random_state):
+    from sklearn.base import clone, is_classifier
+    from sklearn.model_selection import KFold, StratifiedKFold, cross_val_score
+
+    # workers read the training data memory-mapped from one shared file instead of each receiving a pickled copy
+    X, y = joblib.load(data_path, mmap_mode="r")
+    X, y = _subsample(X, y, n_samples, random_state)
+    splitter = StratifiedKFold if is_classifier(estimator) else KFold
+    folds = splitter(n_splits=cv, shuffle=True, random_state=random_state)
+
+    start = time.perf_counter()
+    scores = cross_val_score(clone(estimator).set_params(**params), X, y, cv=folds, scoring=scoring)
+    return {
+        "mean_score": float(np.mean(scores)),
+        "std_score": float(np.std(scores)),
+        "fit_seconds": time.perf_counter() - start,
+    }
+
+
+class ModelSearch:
+    """Scores parameter candidates with k-fold CV in a process pool, with an on-disk score cache.
+
+    Stops early when the best score has not improved for ``patience``
+    finished candidates, or when ``time_budget`` seconds have passed;
+    candidates that have not started yet are then cancelled.
+    """
+
+    def __init__(self, estimator, cv=5, scoring=None, max_workers=None, cache_dir=SEARCH_CACHE_DIR,
+                 patience=None, time_budget=None, random_state=0):
+        self.estimator = estimator
+        self.cv = cv
+        self.scoring = scoring
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.patience = patience
+        self.time_budget = time_budget
+        self.random_state = random_state
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def evaluate(self, params_list, X, y, version=None, n_samples=None):
+        """CV scores for every parameter dict, as a frame sorted best first."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        version = version or dataset_version(X, y)
+        rows, pending = [], {}
+        for params in params_list:
+            key = _key(version, self.estimator, params, n_samples, self.cv, self.scoring, self.random_state)
+            if os.path.exists(self._path(key)):
+                metrics.count("cv_score", "hit")
+                rows.append(dict(joblib.load(self._path(key)), params=params, cached=True))
+            else:
+                metrics.count("cv_score", "miss")
+                pending[key] = params
+
+        if pending:
+            data_path = self._path(f"data-{version[:20]}")
+            if not os.path.exists(data_path):
+                _dump((X, y), data_path)
+            best = max((row["mean_score"] for row in rows), default=None)
+            rows += self._run(pending, data_path, n_samples, best)
+
+        report = pd.DataFrame(rows, columns=["params", "mean_score", "std_score", "fit_seconds", "cached"])
+        return report.sort_values("mean_score", ascending=False, ignore_index=True)
+
+    def _run(self, pending, data_path, n_samples, best=None):
+        rows, stale = [], 0
+        deadline = None if self.time_budget is None else time.monotonic() + self.time_budget
+        executor = ProcessPoolExecutor(self.max_workers)
+        try:
+            futures = {
+                executor.submit(_evaluate, self.estimator, params, data_path, n_samples, self.cv,
+                                self.scoring, self.random_state): (key, params)
+                for key, params in pending.items()
+            }
+            remaining = set(futures)
+            while remaining:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                done, remaining = wait(remaining, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, params = futures[future]
+                    result = future.result()
+                    # the fit ran in a worker process, record the time it reported here
+                    metrics.observe("fit", result["fit_seconds"])
+                    _dump(result, self._path(key))
+                    rows.append(dict(result, params=params, cached=False))
+                    if best is None or result["mean_score"] > best:
+                        best, stale = result["mean_score"], 0
+                    else:
+                        stale += 1
+                out_of_time = deadline is not None and time.monotonic() >= deadline
+                if out_of_time or (self.patience is not None and stale >= self.patience):
+                    break
+        finally:
+            # cancel candidates that have not started; running ones finish but are not waited for
+            executor.shutdown(wait=False, cancel_futures=True)
+        return rows
+
+    def halving(self, params_list, X, y, version=None, factor=3, min_samples=None):
+        """Successive halving: score all candidates on a small sample, keep the best ``1/factor``, grow the sample.
+
+        Returns the report of every round, with ``round`` and ``n_samples`` columns.
+        """
+        version = version or dataset_version(X, y)
+        n = len(y)
+        rounds = max(int(np.ceil(np.log(max(len(params_list), 1)) / np.log(factor))), 0)
+        n_samples = max(min_samples or n // factor ** rounds, self.cv * 2)
+
+        reports = []
+        for round_number in range(rounds + 1):
+            # the last round always uses all rows
+            size = None if round_number == rounds or n_samples >= n else n_samples
+            report = self.evaluate(params_list, X, y, version, size)
+            reports.append(report.assign(round=round_number, n_samples=size or n))
+            if size is None:
+                break
+            params_list = list(report["params"].head(max(len(report) // factor, 1)))
+            # a single survivor has nothing left to compete with, so go straight to all rows
+            n_samples = n if len(params_list) == 1 else n_samples * factor
+        return pd.concat(reports, ignore_index=True)
+
+
+def save_model(name, model, metadata, artifact_dir=ARTIFACT_DIR):
+    """Persist a fitted model the way ``api.predict.load_models`` expects it."""
+    os.makedirs(artifact_dir, exist_ok=True)
+    path = os.path.join(artifact_dir, f"{name}.joblib")
+    _dump(dict(metadata, model=model), path)
+    return path
+
+
+def search(estimator, space, X, y, name=None, method="grid", cv=5, scoring=None, n_iter=20,
+           max_workers=None, patience=None, time_budget=None, random_state=0, artifact_dir=ARTIFACT_DIR):
+    """Find the best parameters for ``estimator`` with ``method`` = "grid", "random" or "halving".
+
+    Halving starts from the full grid, or from ``n_iter`` random samples
+    when ``space`` contains distributions. The best candidate is refitted on
+    all of ``X``/``y`` and, if ``name`` is given, saved for the serving layer.
+    Returns a dict with the fitted ``model``, ``params``, ``score``, the full
+    ``report`` and the artifact ``path``.
+    """
+    from sklearn.base import clone
+
+    version = dataset_version(X, y)
+    searcher = ModelSearch(estimator, cv=cv, scoring=scoring, max_workers=max_workers,
+                           patience=patience, time_budget=time_budget, random_state=random_state)
+    has_distributions = any(hasattr(values, "rvs") for values in space.values())
+    params_list = candidates(space, "random" if method == "random" or has_distributions else "grid",
+                             n_iter, random_state)
+
+    if method == "halving":
+        report = searcher.halving(params_list, X, y, version)
+        final = report[report["round"] == report["round"].max()]
+    else:
+        report = final = searcher.evaluate(params_list, X, y, version)
+    if final.empty:
+        raise RuntimeError("no candidate finished within the time budget")
+
+    best = final.iloc[0]
+    start = time.perf_counter()
+    with metrics.span("fit"):
+        model = clone(estimator).set_params(**best["params"]).fit(X, y)
+    result = {
+        "model": model,
+        "params": best["params"],
+        "score": float(best["mean_score"]),
+        "report": report,
+        "path": None,
+    }
+    if name is not None:
+        result["path"] = save_model(name, model, {
+            "params": best["params"],
+            "cv_score": result["score"],
+            "scoring": scoring,
+            "dataset_version": version,
+            "fit_seconds": time.perf_counter() - start,
+        }, artifact_dir)
+    return result
@@ -0,0 +1,110 @@
+import asyncio
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://backend:8000")
+CACHE_TTL = float(os.environ.get("BACKEND_CACHE_TTL", "60"))
+MAX_CONNECTIONS = int(os.environ.get("BACKEND_MAX_CONNECTIONS", "20"))
+CACHE_ENTRIES = int(os.environ.get("BACKEND_CACHE_ENTRIES", "128"))
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+
+class BackendError(Exception):
+    """The backend answered with an ``{"error": ...}`` body instead of data."""
+
+
+def read_table(content, content_type):
+    """Rebuild a DataFrame from a backend response body without going through JSON."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == ARROW_STREAM:
+        return pa.ipc.open_stream(pa.py_buffer(content)).read_all().to_pandas()
+    if media_type == PARQUET:
+        return pq.read_table(io.BytesIO(content)).to_pandas()
+    payload = json.loads(content)
+    # the routes report errors (e.g. a missing CSV) as {"error": ...} with status 200
+    if "error" in payload:
+        raise BackendError(payload["error"])
+    return pd.DataFrame(payload["data"])
+
+
+class BackendClient:
+    """Pooled async HTTP client for the FastAPI backend, usable from Streamlit scripts.
+
+    A single ``httpx.AsyncClient`` (keep-alive, HTTP/1.1 connection pool) runs
+    on a background event loop, so independent requests of a page can be
+    issued concurrently with ``fetch_many``. Decoded responses are cached for
+    ``ttl`` seconds; after that they are revalidated with ``If-None-Match`` and
+    a 304 reuses the cached frame. At most ``max_entries`` responses are kept,
+    the least recently used are dropped first. Returned frames are shared,
+    treat them as read-only.
+    """
+
+    def __init__(self, base_url=BACKEND_URL, ttl=CACHE_TTL, max_connections=MAX_CONNECTIONS, timeout=30.0,
+                 max_entries=CACHE_ENTRIES):
+        self.base_url = base_url
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = self._run(self._create_client(limits, timeout))
+
+    async def _create_client(self, limits, timeout):
+        return httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=timeout)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _get(self, path, params, media_type):
+        key = (path, tuple(sorted((params or {}).items())), media_type)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+        if cached is not None and cached["expires"] > time.monotonic():
+            return cached["frame"]
+
+        headers = {"Accept": media_type}
+        if cached is not None and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        response = await self._client.get(path, params=params, headers=headers)
+        if response.status_code == 304 and cached is not None:
+            cached["expires"] = time.monotonic() + self.ttl
+            return cached["frame"]
+        response.raise_for_status()
+
+        frame = read_table(response.content, response.headers.get("content-type"))
+        self._cache[key] = {
+            "frame": frame,
+            "etag": response.headers.get("etag"),
+            "expires": time.monotonic() + self.ttl,
+        }
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return frame
+
+    async def _get_many(self, requests, media_type):
+        return await asyncio.gather(*(self._get(path, params, media_type) for path, params in requests))
+
+    def fetch(self, path, params=None, media_type=ARROW_STREAM):
+        return self._run(self._get(path, params, media_type))
+
+    def fetch_many(self, requests, media_type=ARROW_STREAM):
+        """Fetch several ``(path, params)`` pairs concurrently, returning frames in order."""
+        return self._run(self._get_many(requests, media_type))
+
+    def close(self):
+        self._run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -1,6 +1,15 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import httpx
+
+from data_access import BackendClient, BackendError
+
+
+@st.cache_resource
+def get_backend_client():
+    # One pooled client per process, its response cache survives reruns
+    return BackendClient()
 
 def show():
     # Page title
@@ -40,6 +49,22 @@ def show():
     st.write("Bar Chart")
     st.bar_chart(data)
 
+    # Data from the backend, both requests are sent concurrently
+    st.write("LLM Models (from backend)")
+    try:
+        models, moe_models = get_backend_client().fetch_many([
+            ("/llm", {"columns": "Model,Comapany,Arch,Parameters"}),
+            ("/llm", {"Arch": "MoE", "columns": "Model,Comapany,Parameters"}),
+        ])
+    except httpx.HTTPError as e:
+        st.warning(f"Could not reach the backend: {e}")
+    except BackendError as e:
+        st.warning(f"The backend could not load the data: {e}")
+    else:
+        st.dataframe(models)
+        st.write(f"Mixture-of-Experts models: {len(moe_models)}")
+        st.dataframe(moe_models)
+
     # Plotting using Matplotlib
     import matplotlib.pyplot as plt
 
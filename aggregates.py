@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+from ingest import (
+    DATE_COLUMN, TIME_COLUMN, PROVINCE_COLUMN, CAUSE_COLUMN, WEATHER_COLUMN, ROAD_COLUMN,
+    COUNT_COLUMNS,
+)
+
+DIMENSIONS = ['date', 'hour', PROVINCE_COLUMN, CAUSE_COLUMN, WEATHER_COLUMN, ROAD_COLUMN]
+
+
+class AccidentCube:
+    """Pre-aggregated accident counts keyed by (date, hour, province, cause, weather, road).
+
+    ``frame`` holds one row per observed key combination with a ``count``
+    column and the summed vehicle/casualty measures. ``moments`` holds the
+    row count, column sums and cross-products of the measures so the
+    correlation matrix can be recovered without the raw rows.
+    """
+
+    def __init__(self, frame, moments=None):
+        self.frame = frame
+        self.moments = moments
+
+    @property
+    def measures(self):
+        return [column for column in COUNT_COLUMNS if column in self.frame.columns]
+
+    def counts_by(self, column):
+        """Equivalent of ``df[column].value_counts()`` on the raw rows."""
+        counts = self.frame.groupby(column, observed=True)['count'].sum()
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        counts.index = counts.index.astype(object)
+        return counts
+
+    def daily(self):
+        return self.frame.groupby('date')['count'].sum().sort_index()
+
+    def hourly(self):
+        return self.frame.groupby('hour')['count'].sum().sort_index()
+
+    def monthly(self):
+        return self.frame.groupby(self.frame['date'].dt.to_period('M'))['count'].sum().sort_index()
+
+    def totals(self, columns):
+        return self.frame[columns].sum()
+
+    def correlation(self, columns):
+        return _correlation(self.moments, columns)
+
+    def combine(self, other):
+        """Merge two cubes built from disjoint sets of rows."""
+        frame = _regroup(pd.concat([self.frame, other.frame], ignore_index=True), self.measures)
+        return AccidentCube(frame, _combine_moments(self.moments, other.moments))
+
+    def marginals(self):
+        """The per-dimension rollups the dashboard charts read, see :class:`CubeMarginals`."""
+        counts = {column: self.counts_by(column) for column in DIMENSIONS[2:]}
+        counts['date'] = self.daily()
+        counts['hour'] = self.hourly()
+        counts['month'] = self.monthly()
+        return CubeMarginals(counts, self.totals(self.measures), self.moments)
+
+
+class CubeMarginals:
+    """One-dimensional rollups of an :class:`AccidentCube`: counts by date, hour,
+    month and each categorical dimension, the measure totals and the moments.
+
+    Answers the same chart queries as the cube, but each one is a lookup of
+    a small precomputed series, while the cube itself keeps almost one row
+    per accident. Marginals of disjoint sets of rows merge with ``combine``.
+    """
+
+    def __init__(self, counts, sums, moments=None):
+        self.counts = counts
+        self.sums = sums
+        self.moments = moments
+
+    def counts_by(self, column):
+        return self.counts[column]
+
+    def daily(self):
+        return self.counts['date']
+
+    def hourly(self):
+        return self.counts['hour']
+
+    def monthly(self):
+        return self.counts['month']
+
+    def totals(self, columns):
+        return self.sums[columns]
+
+    def correlation(self, columns):
+        return _correlation(self.moments, columns)
+
+    def combine(self, other):
+        """Merge the marginals of two disjoint sets of rows."""
+        counts = {}
+        for column, series in self.counts.items():
+            merged = pd.concat([series, other.counts[column]]).groupby(level=0).sum()
+            if column in DIMENSIONS[2:]:
+                merged = merged.sort_values(ascending=False, kind='stable')
+                merged.index = merged.index.astype(object)
+            counts[column] = merged.rename_axis(series.index.name)
+        sums = self.sums.add(other.sums, fill_value=0).astype('int64')
+        return CubeMarginals(counts, sums, _combine_moments(self.moments, other.moments))
+
+
+def _correlation(moments, columns):
+    if moments is None:
+        raise ValueError("correlation needs the moments of the full cube")
+    n, sums, cross = moments['n'], moments['sums'], moments['cross']
+    names = list(sums.index)
+    positions = [names.index(column) for column in columns]
+    mean = sums.to_numpy()[positions] / n
+    cov = (cross[np.ix_(positions, positions)] - n * np.outer(mean, mean)) / (n - 1)
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+    return pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def _combine_moments(a, b):
+    if a is None or b is None:
+        return None
+    return {'n': a['n'] + b['n'], 'sums': a['sums'] + b['sums'], 'cross': a['cross'] + b['cross']}
+
+
+def _regroup(frame, measures):
+    for column in DIMENSIONS[2:]:
+        if frame[column].dtype != 'category':
+            frame[column] = frame[column].astype('category')
+    grouped = frame.groupby(DIMENSIONS, observed=True, dropna=False, sort=False)
+    return grouped[['count'] + measures].sum().reset_index()
+
+
+def build_cube(df):
+    """Aggregate the raw accident rows into an :class:`AccidentCube`."""
+    measures = [column for column in COUNT_COLUMNS if column in df.columns]
+    frame = pd.DataFrame({
+        'date': df[DATE_COLUMN].dt.normalize(),
+        'hour': df[TIME_COLUMN].dt.hour.astype('int8'),
+    })
+    for column in DIMENSIONS[2:]:
+        frame[column] = df[column].astype('category')
+    frame['count'] = np.ones(len(df), dtype='int64')
+    for column in measures:
+        frame[column] = df[column].astype('int64')
+
+    values = df[measures].to_numpy(dtype='float64')
+    moments = {
+        'n': len(df),
+        'sums': pd.Series(values.sum(axis=0), index=measures),
+        'cross': values.T @ values,
+    }
+    return AccidentCube(_regroup(frame, measures), moments)
@@ -1,104 +1,144 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import mean_squared_error, accuracy_score
-from statsmodels.tsa.arima.model import ARIMA
 import plotly.express as px
 
-# โหลดข้อมูล (สมมติว่าเรามีฟังก์ชัน load_data() ที่โหลดข้อมูลเรียบร้อยแล้ว)
-@st.cache_data
-def load_data():
-    df = pd.read_csv("accident2021.csv")
-    df['วันที่เกิดเหตุ'] = pd.to_datetime(df['วันที่เกิดเหตุ'], format='%d/%m/%Y', errors='coerce')
-    df['เวลา'] = pd.to_datetime(df['เวลา'], format='%H:%M', errors='coerce')
-    df = df.dropna(subset=['วันที่เกิดเหตุ', 'เวลา'])
-    return df
+from forecasting import Forecaster, daily_series_from_stats
+from instrumentation import RenderTimer
+from result_cache import ResultCache
+from store import STORE_DIR, read_manifest, sync_store, load_store_summary
+from training import TrainingService
 
-df = load_data()
+DATA_PATH = STORE_DIR
 
-st.header("7. การสร้างแบบจำลองทำนาย")
-
-# 1. การวิเคราะห์การถดถอย (Regression Analysis)
-st.subheader("1. การวิเคราะห์การถดถอย (Regression Analysis)")
-
-# เตรียมข้อมูล
-df['hour'] = df['เวลา'].dt.hour
-df['day_of_week'] = df['วันที่เกิดเหตุ'].dt.dayofweek
-weather_dummies = pd.get_dummies(df['สภาพอากาศ'], prefix='weather')
-road_dummies = pd.get_dummies(df['บริเวณที่เกิดเหตุ'], prefix='road')
+# แผงดีบัก: เวลาเรนเดอร์ของแต่ละส่วนในหน้า (ปิดไว้เป็นค่าเริ่มต้น)
+debug = st.sidebar.checkbox("แสดงเวลาเรนเดอร์ (debug)")
+timer = RenderTimer(debug, trace_memory=debug and st.sidebar.checkbox("วัดหน่วยความจำด้วย tracemalloc"))
+timer.lap("ส่งงานเทรน")
 
-X = pd.concat([df[['hour', 'day_of_week']], weather_dummies, road_dummies], axis=1)
-y = df['ผู้บาดเจ็บสาหัส'] + df['ผู้บาดเจ็บเล็กน้อย']
+# การเทรนโมเดลทำในโปรเซสเบื้องหลัง และเก็บโมเดลที่เทรนแล้วไว้ตามเวอร์ชันข้อมูลและพารามิเตอร์
+@st.cache_resource
+def get_training_service():
+    return TrainingService()
 
-# แบ่งข้อมูลสำหรับการเทรนและทดสอบ
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+service = get_training_service()
+version = sync_store()
+if not read_manifest(STORE_DIR)["files"]:
+    st.warning("ยังไม่มีข้อมูลอุบัติเหตุ: วางไฟล์ CSV ลงใน data/drops แล้วโหลดหน้าใหม่ (ไฟล์ที่ถูกปฏิเสธดูได้ใน data/accidents/_manifest.json)")
+    st.stop()
 
-# สร้างและเทรนโมเดล
-model = LinearRegression()
-model.fit(X_train, y_train)
+regression_params = {'test_size': 0.2, 'random_state': 42}
+classifier_params = {'test_size': 0.2, 'random_state': 42, 'n_estimators': 100}
 
-# ทำนายและประเมินผล
-y_pred = model.predict(X_test)
-mse = mean_squared_error(y_test, y_pred)
-st.write(f"Mean Squared Error: {mse:.2f}")
+# ส่งงานเทรนทั้งหมดก่อน เพื่อให้เทรนพร้อมกันหลายโปรเซส
+for name, params in [('regression', regression_params), ('classifier', classifier_params)]:
+    service.submit(name, DATA_PATH, version, params)
 
-# แสดงผลลัพธ์
-fig = px.scatter(x=y_test, y=y_pred, labels={'x': 'Actual', 'y': 'Predicted'}, 
-                 title='Actual vs Predicted Injuries')
-st.plotly_chart(fig)
-
-# 2. การจำแนกประเภท (Classification)
-st.subheader("2. การจำแนกประเภท (Classification)")
+pending = False
 
-# เตรียมข้อมูล
-df['accident_severity'] = np.where(df['ผู้เสียชีวิต'] > 0, 1, 0)
-vehicle_columns = ['รถจักรยานยนต์', 'รถยนต์นั่งส่วนบุคคล', 'รถปิคอัพบรรทุก4ล้อ', 'รถบรรทุก6ล้อ', 'รถอื่นๆ']
+def show_training():
+    st.info("กำลังเทรนโมเดลอยู่เบื้องหลัง ผลลัพธ์จะแสดงเมื่อเทรนเสร็จ")
 
-X = pd.concat([df[['hour', 'day_of_week'] + vehicle_columns], weather_dummies], axis=1)
-y = df['accident_severity']
+st.header("7. การสร้างแบบจำลองทำนาย")
 
-# แบ่งข้อมูลสำหรับการเทรนและทดสอบ
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+# 1. การวิเคราะห์การถดถอย (Regression Analysis)
+timer.lap("1. การวิเคราะห์การถดถอย (Regression Analysis)")
+st.subheader("1. การวิเคราะห์การถดถอย (Regression Analysis)")
 
-# สร้างและเทรนโมเดล
-model = RandomForestClassifier(random_state=42)
-model.fit(X_train, y_train)
+regression = service.get('regression', DATA_PATH, version, regression_params)
+if regression is None:
+    pending = True
+    show_training()
+else:
+    # ส่งโมเดลไปให้ backend ใช้ทำนายผ่าน POST /predict/regression (เขียนไฟล์ครั้งเดียวต่อเวอร์ชันโมเดล)
+    service.publish('regression', DATA_PATH, version, regression_params)
+    st.write(f"Mean Squared Error: {regression['mse']:.2f}")
+    if 'fit_seconds' in regression:
+        st.write(f"เวลาเทรน: {regression['fit_seconds']:.1f} วินาที")
+
+    # แสดงผลลัพธ์
+    fig = px.scatter(x=regression['y_test'], y=regression['y_pred'], labels={'x': 'Actual', 'y': 'Predicted'},
+                     title='Actual vs Predicted Injuries')
+    st.plotly_chart(fig)
 
-# ทำนายและประเมินผล
-y_pred = model.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-st.write(f"Accuracy: {accuracy:.2f}")
+# 2. การจำแนกประเภท (Classification)
+timer.lap("2. การจำแนกประเภท (Classification)")
+st.subheader("2. การจำแนกประเภท (Classification)")
 
-# แสดงความสำคัญของฟีเจอร์
-feature_importance = pd.DataFrame({'feature': X.columns, 'importance': model.feature_importances_})
-feature_importance = feature_importance.sort_values('importance', ascending=False).head(10)
-fig = px.bar(feature_importance, x='importance', y='feature', orientation='h', 
-             title='Top 10 Most Important Features')
-st.plotly_chart(fig)
+classifier = service.get('classifier', DATA_PATH, version, classifier_params)
+if classifier is None:
+    pending = True
+    show_training()
+else:
+    service.publish('classifier', DATA_PATH, version, classifier_params)
+    st.write(f"Accuracy: {classifier['accuracy']:.2f}")
+    if 'fit_seconds' in classifier:
+        st.write(f"เวลาเทรน: {classifier['fit_seconds']:.1f} วินาที")
+
+    # แสดงความสำคัญของฟีเจอร์
+    feature_importance = pd.DataFrame({'feature': classifier['features'], 'importance': classifier['feature_importances']})
+    feature_importance = feature_importance.sort_values('importance', ascending=False).head(10)
+    fig = px.bar(feature_importance, x='importance', y='feature', orientation='h',
+                 title='Top 10 Most Important Features')
+    st.plotly_chart(fig)
 
 # 3. การวิเคราะห์อนุกรมเวลา (Time Series Analysis)
+timer.lap("3. การวิเคราะห์อนุกรมเวลา (Time Series Analysis)")
 st.subheader("3. การวิเคราะห์อนุกรมเวลา (Time Series Analysis)")
 
-# เตรียมข้อมูล
-daily_accidents = df.groupby('วันที่เกิดเหตุ').size().reset_index(name='count')
-daily_accidents = daily_accidents.set_index('วันที่เกิดเหตุ')
+# อนุกรมรายวันของทั้งประเทศและแต่ละจังหวัด ฟิต ARIMA แบบขนานหลายโปรเซส และแคชผลตามเวอร์ชันข้อมูล
+@st.cache_resource
+def get_forecaster():
+    return Forecaster(order=(1, 1, 1))
+
+# อนุกรมรายวันเก็บใน result cache ที่ใช้ร่วมกันทุกโปรเซส โปรเซสใหม่จึงไม่ต้องคำนวณซ้ำ
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+# ใช้สรุปของ store ชุดเดียวกับที่ main.py เก็บไว้ใน result cache ("store_summary") ไม่รวมซ้ำ
+@st.cache_resource
+def load_daily_series(version):
+    results = get_result_cache()
+    def compute():
+        summary = results.get_or_compute("store_summary", version, lambda: load_store_summary(STORE_DIR))
+        return daily_series_from_stats(summary['stats'])
+    return results.get_or_compute("daily_series", version, compute)
 
-# สร้างและเทรนโมเดล ARIMA
-model = ARIMA(daily_accidents['count'], order=(1, 1, 1))
-results = model.fit()
+series = load_daily_series(version)
+selected_series = st.selectbox("พื้นที่", list(series))
+daily_accidents = series[selected_series].to_frame()
 
-# ทำนาย 30 วันถัดไป
-forecast = results.forecast(steps=30)
+# ฟิต ARIMA ทุกอนุกรมใน service เบื้องหลัง หน้าเว็บไม่ต้องรอ ระหว่างนั้นแสดงเฉพาะข้อมูลจริง
+forecasts = service.run(('forecast', version), get_forecaster().forecast, series, version, steps=30)
 
 # แสดงผลลัพธ์
-fig = px.line(daily_accidents, x=daily_accidents.index, y='count', title='Daily Accidents and Forecast')
-fig.add_scatter(x=forecast.index, y=forecast, mode='lines', name='Forecast')
+fig = px.line(daily_accidents, x=daily_accidents.index, y='count', title=f'Daily Accidents and Forecast ({selected_series})')
+if forecasts is None:
+    pending = True
+    show_training()
+else:
+    forecast = forecasts[selected_series]['forecast']
+    fig.add_scatter(x=forecast.index, y=forecast, mode='lines', name='Forecast')
 st.plotly_chart(fig)
 
+# ประเมินความแม่นยำแบบ rolling-origin: เทรนถึงวันตั้งต้น แล้ววัดผล 7 วันถัดไป เลื่อนทีละ 7 วัน
+if st.checkbox("ประเมินผลย้อนหลัง (rolling-origin backtest)"):
+    report = service.run(('backtest', selected_series, version), get_forecaster().backtest,
+                         {selected_series: series[selected_series]}, version, horizon=7, step=7)
+    if report is None:
+        pending = True
+        show_training()
+    else:
+        st.write(f"MAE เฉลี่ย: {report['mae'].mean():.2f}, RMSE เฉลี่ย: {report['rmse'].mean():.2f}, "
+                 f"เวลาฟิตเฉลี่ย: {report['fit_seconds'].mean():.3f} วินาที")
+        st.dataframe(report)
+
+if pending:
+    st.button("ตรวจสอบสถานะการเทรนอีกครั้ง")
+
 st.write("""
 หมายเหตุ: แบบจำลองเหล่านี้เป็นเพียงตัวอย่างเบื้องต้น ในการใช้งานจริง ควรมีการปรับแต่งพารามิเตอร์, 
 ทำ feature engineering เพิ่มเติม, และใช้เทคนิคการประเมินผลที่ซับซ้อนมากขึ้น เพื่อให้ได้ผลลัพธ์ที่แม่นยำและน่าเชื่อถือมากขึ้น
-""")
\ No newline at end of file
+""")
+
+timer.render(st.sidebar)
@@ -0,0 +1,61 @@
+"""Compare JSON, Arrow IPC and Parquet encodings of the /llm table.
+
+Usage: python benchmarks/bench_formats.py [--rows 100000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Backend"))
+sys.path.insert(0, os.path.join(ROOT, "Frontend"))
+
+from api.formats import ARROW_STREAM, PARQUET, serialize  # noqa: E402
+from data_access import read_table  # noqa: E402
+
+
+def json_encode(df):
+    # Same path as the JSON branch of read_csv(), plus the encoding FastAPI does
+    data = df.astype(object).where(pd.notnull(df), None).to_dict(orient="records")
+    return json.dumps({"data": data}).encode()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    source = pd.read_csv(os.path.join(ROOT, "Backend", "data", "llm2024.csv"), encoding="latin1")
+    source = source.replace([np.inf, -np.inf], np.nan)
+    df = source.sample(args.rows, replace=True, random_state=0).reset_index(drop=True)
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    print(f"{'format':<10}{'encode ms':>12}{'decode ms':>12}{'bytes':>14}")
+    encoders = {
+        "json": (json_encode, "application/json"),
+        "arrow": (lambda frame: serialize(frame, ARROW_STREAM), ARROW_STREAM),
+        "parquet": (lambda frame: serialize(frame, PARQUET), PARQUET),
+    }
+    for name, (encode, media_type) in encoders.items():
+        encode_time, payload = best_of(lambda: encode(df), args.repeat)
+        decode_time, _ = best_of(lambda: read_table(payload, media_type), args.repeat)
+        print(f"{name:<10}{encode_time * 1000:>12.1f}{decode_time * 1000:>12.1f}{len(payload):>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Recall vs latency of the KNN index against exact brute-force search.
+
+Low-dimensional case: LATITUDE/LONGITUDE of synthetic accidents (KD-tree and
+haversine ball tree). High-dimensional case: clustered random features (IVF
+at several ``n_probe`` settings). Recall@k is the share of the exact k
+nearest neighbours that the index returns.
+
+Usage: python benchmarks/bench_knn.py [--rows 200000] [--queries 2000] [--dims 64] [--k 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Backend"))
+
+from sklearn.neighbors import NearestNeighbors  # noqa: E402
+
+from models.knn_index import KNNIndexClassifier  # noqa: E402
+from synthetic import generate_accidents  # noqa: E402
+
+
+def recall(found, exact):
+    return np.mean([len(np.intersect1d(a, b)) / len(b) for a, b in zip(found, exact)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def report(name, build, query, n_queries, found, exact):
+    print(f"{name:<22}{build:>10.2f}{query * 1e6 / n_queries:>14.1f}{recall(found, exact):>10.3f}")
+
+
+def bench(title, X, Q, k, variants, metric="euclidean"):
+    print(f"\n{title}: {len(X):,} rows x {X.shape[1]} features, {len(Q):,} queries, k={k}")
+    print(f"{'index':<22}{'build s':>10}{'us/query':>14}{'recall':>10}")
+    points, queries = (np.radians(X), np.radians(Q)) if metric == "haversine" else (X, Q)
+    brute = NearestNeighbors(n_neighbors=k, algorithm="brute", metric=metric)
+    build, _ = timed(lambda: brute.fit(points))
+    query, exact = timed(lambda: brute.kneighbors(queries, return_distance=False))
+    report("brute force (exact)", build, query, len(Q), exact, exact)
+
+    labels = np.zeros(len(X), dtype='int8')
+    for name, (params, sweep) in variants.items():
+        model = KNNIndexClassifier(n_neighbors=k, metric=metric, **params)
+        build, _ = timed(lambda: model.fit(X, labels))
+        query, found = timed(lambda: model.kneighbors(Q, return_distance=False))
+        report(name, build, query, len(Q), found, exact)
+
+        # IVF: the same index at other n_probe settings, without rebuilding
+        for n_probe in sweep:
+            model.index_.n_probe = n_probe
+            query, found = timed(lambda: model.kneighbors(Q, return_distance=False))
+            report(f"  n_probe={n_probe}", 0.0, query, len(Q), found, exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    parser.add_argument("--dims", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    accidents = generate_accidents(args.rows + args.queries, seed=0, invalid_fraction=0)
+    coordinates = accidents[['LATITUDE', 'LONGITUDE']].to_numpy()
+    X, Q = coordinates[:args.rows], coordinates[args.rows:]
+    bench("LATITUDE/LONGITUDE", X, Q, args.k, {"kd_tree": ({"algorithm": "kd_tree"}, ())})
+    bench("LATITUDE/LONGITUDE (haversine)", X, Q, args.k, {"ball_tree": ({"algorithm": "ball_tree"}, ())},
+          metric="haversine")
+
+    centers = rng.normal(0, 1.0, (256, args.dims))
+    features = centers[rng.integers(0, len(centers), args.rows + args.queries)]
+    features += rng.normal(0, 1, features.shape)
+    X, Q = features[:args.rows], features[args.rows:]
+    bench(f"{args.dims}-dimensional features", X, Q, args.k, {
+        "ivf n_probe=1": ({"algorithm": "ivf", "n_probe": 1}, (2, 4, 8, 16, 32, 64)),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Benchmark harness for the dashboard and backend hot paths.
+
+Times ingest, every aggregation, the ARIMA forecast fit, model fit/predict
+and endpoint throughput on synthetic accident data of each requested size,
+and stores the results per commit so they can be compared between commits.
+
+Usage: python benchmarks/run.py [--sizes 10k,100k,1m,10m] [--repeat 3]
+                                [--concurrency 32] [--requests 256] [--compare]
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Backend"))
+sys.path.insert(0, ROOT)
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+
+from aggregates import build_cube  # noqa: E402
+from chunked import build_cube_chunked  # noqa: E402
+from drilldown import ProvinceIndex, province_stats, province_summaries  # noqa: E402
+from features import add_time_features, classifier_pipeline, regression_pipeline  # noqa: E402
+from forecasting import NATIONAL, daily_series_from_stats, fit_series  # noqa: E402
+from ingest import (  # noqa: E402
+    CAUSE_COLUMN, COUNT_COLUMNS, DATE_COLUMN, PROVINCE_COLUMN, ROAD_COLUMN, SEVERITY_COLUMNS,
+    TIME_COLUMN, VEHICLE_COLUMNS, WEATHER_COLUMN,
+    ensure_cache, load_accidents, parse_accidents,
+)
+from spatial import SpatialIndex  # noqa: E402
+from store import load_store, load_store_summary, sync_store  # noqa: E402
+
+from synthetic import generate_accidents  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+REGRESSION_THRESHOLD = 0.10
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+class Recorder:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def time(self, name, fn, repeat=None, setup=None):
+        """Best-of-N wall time of ``fn()`` in seconds, stored as ``<name>_s``."""
+        timings, result = [], None
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+        self.results[f"{name}_s"] = min(timings)
+        return result
+
+    def record(self, name, value):
+        self.results[name] = value
+
+
+def bench_ingest(rec, csv_path, workdir):
+    cache_dir = os.path.join(workdir, "cache")
+    store_dir = os.path.join(workdir, "store")
+
+    rec.time("ingest.parse_csv", lambda: parse_accidents(csv_path), repeat=1)
+    rec.time("ingest.arrow_cache_build", lambda: ensure_cache(csv_path, cache_dir), repeat=1,
+             setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+    df = rec.time("ingest.arrow_cache_load", lambda: load_accidents(csv_path, cache_dir))
+    rec.time("ingest.store_sync", lambda: sync_store([csv_path], store_dir), repeat=1,
+             setup=lambda: shutil.rmtree(store_dir, ignore_errors=True))
+    rec.time("ingest.store_sync_unchanged", lambda: sync_store([csv_path], store_dir))
+    rec.time("ingest.store_load", lambda: load_store(store_dir))
+    rec.time("ingest.store_summary_load", lambda: load_store_summary(store_dir))
+    rec.time("ingest.chunked_cube_build", lambda: build_cube_chunked(store_dir), repeat=1)
+    return df
+
+
+def raw_aggregations(df):
+    # เส้นฐาน: การคำนวณแบบเดิมของ main.py บนแถวดิบทุกครั้งที่ rerun
+    return {
+        "daily": lambda: df[DATE_COLUMN].dt.date.value_counts().sort_index(),
+        "hourly": lambda: df[TIME_COLUMN].dt.hour.value_counts().sort_index(),
+        "monthly": lambda: df.groupby(df[DATE_COLUMN].dt.to_period('M')).size(),
+        "road": lambda: df[ROAD_COLUMN].value_counts(),
+        "cause": lambda: df[CAUSE_COLUMN].value_counts(),
+        "weather": lambda: df[WEATHER_COLUMN].value_counts(),
+        "top_provinces": lambda: df[PROVINCE_COLUMN].value_counts().head(10),
+        "vehicle_totals": lambda: df[VEHICLE_COLUMNS].sum(),
+        "severity_totals": lambda: df[SEVERITY_COLUMNS].sum(),
+        "correlation": lambda: df[COUNT_COLUMNS].corr(),
+    }
+
+
+def cube_aggregations(cube):
+    # ชื่อเดียวกับ raw_aggregations เพื่อเทียบกันได้ทีละกราฟ
+    return {
+        "daily": cube.daily,
+        "hourly": cube.hourly,
+        "monthly": cube.monthly,
+        "road": lambda: cube.counts_by(ROAD_COLUMN),
+        "cause": lambda: cube.counts_by(CAUSE_COLUMN),
+        "weather": lambda: cube.counts_by(WEATHER_COLUMN),
+        "top_provinces": lambda: cube.counts_by(PROVINCE_COLUMN).head(10),
+        "vehicle_totals": lambda: cube.totals(VEHICLE_COLUMNS),
+        "severity_totals": lambda: cube.totals(SEVERITY_COLUMNS),
+        "correlation": lambda: cube.correlation(COUNT_COLUMNS),
+    }
+
+
+def time_aggregations(rec, prefix, aggregations):
+    """Time every aggregation on its own as ``<prefix>.<name>`` and record their sum as ``<prefix>_rerun``."""
+    for name, fn in aggregations.items():
+        rec.time(f"{prefix}.{name}", fn)
+    rec.record(f"{prefix}_rerun_s", sum(rec.results[f"{prefix}.{name}_s"] for name in aggregations))
+
+
+def bench_aggregates(rec, df):
+    time_aggregations(rec, "aggregate.raw", raw_aggregations(df))
+    cube = rec.time("aggregate.build_cube", lambda: build_cube(df), repeat=1)
+    rec.record("aggregate.cube_rows", len(cube.frame))
+    time_aggregations(rec, "aggregate.cube", cube_aggregations(cube))
+    marginals = rec.time("aggregate.marginals_build", cube.marginals, repeat=1)
+    time_aggregations(rec, "aggregate.marginals", cube_aggregations(marginals))
+
+    province = df[PROVINCE_COLUMN].iloc[0]
+    rec.time("drilldown.raw_scan", lambda: df[df[PROVINCE_COLUMN] == province][CAUSE_COLUMN].value_counts())
+    index = rec.time("drilldown.index_build", lambda: ProvinceIndex(df), repeat=1)
+    rec.time("drilldown.summaries_build", lambda: province_summaries(cube), repeat=1)
+    rec.time("drilldown.index_lookup", lambda: index.rows(province, '2021-03-01', '2021-03-31'))
+
+    spatial = rec.time("spatial.index_build", lambda: SpatialIndex(df['LATITUDE'], df['LONGITUDE']), repeat=1)
+    for zoom in (5, 9, 13):
+        kind, view = rec.time(f"spatial.view_zoom{zoom}", lambda: spatial.view(13.0, 101.0, zoom))
+        rec.record(f"spatial.view_zoom{zoom}_glyphs", len(view))
+
+
+def bench_forecast(rec, df):
+    # อนุกรมรายวันทั้งประเทศและ ARIMA(1, 1, 1) แบบเดียวกับ app.py
+    series = daily_series_from_stats(province_stats(df))[NATIONAL]
+    state = rec.time("forecasting.fit_series", lambda: fit_series(series.iloc[:-1], (1, 1, 1)), repeat=1)
+    rec.time("forecasting.fit_series_update", lambda: fit_series(series, (1, 1, 1), state))
+
+
+def bench_models(rec, df, max_rows):
+    sample = add_time_features(df.sample(min(len(df), max_rows), random_state=0))
+    y_regression = sample['ผู้บาดเจ็บสาหัส'].astype(int) + sample['ผู้บาดเจ็บเล็กน้อย'].astype(int)
+    y_classifier = np.where(sample['ผู้เสียชีวิต'] > 0, 1, 0)
+
+    regression = rec.time("model.regression_fit", lambda: regression_pipeline().fit(sample, y_regression), repeat=1)
+    rec.time("model.regression_predict", lambda: regression.predict(sample))
+    classifier = rec.time("model.classifier_fit",
+                          lambda: classifier_pipeline(n_estimators=50).fit(sample, y_classifier), repeat=1)
+    rec.time("model.classifier_predict", lambda: classifier.predict(sample))
+    return classifier, sample
+
+
+async def _throughput(app, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def send(method, path, kwargs):
+            async with semaphore:
+                response = await client.request(method, path, **kwargs)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(send(*request) for request in requests))
+        return len(requests) / (time.perf_counter() - start)
+
+
+def bench_endpoints(rec, classifier, sample, n_requests, concurrency):
+    from fastapi import FastAPI
+    from api import predict, routes
+
+    # Backend/main.py clashes with the dashboard's main.py on sys.path, so mount the routers directly
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.include_router(predict.router)
+    routes.LLM_CSV_PATH = os.path.join(ROOT, "Backend", "data", "llm2024.csv")
+    predict.models["classifier"] = classifier
+    records = json.loads(sample.head(100).drop(columns=[DATE_COLUMN, TIME_COLUMN]).to_json(
+        orient="records", force_ascii=False))
+
+    cases = {
+        "llm_json": ("GET", "/llm", {}),
+        "llm_page": ("GET", "/llm", {"params": {"limit": 50, "columns": "Model,Arch"}}),
+        "llm_arrow": ("GET", "/llm", {"headers": {"Accept": "application/vnd.apache.arrow.stream"}}),
+        "predict_100_rows": ("POST", "/predict/classifier", {"json": {"records": records}}),
+    }
+    for name, request in cases.items():
+        rps = asyncio.run(_throughput(app, [request] * n_requests, concurrency))
+        rec.record(f"endpoint.{name}_rps", rps)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, previous):
+    """Print metrics that moved by more than REGRESSION_THRESHOLD against ``previous``."""
+    print(f"\ncompared with {previous['commit']} ({previous['timestamp']})")
+    for size, metrics in current["results"].items():
+        for name, value in metrics.items():
+            before = previous["results"].get(size, {}).get(name)
+            if not before or not (name.endswith("_s") or name.endswith("_rps")):
+                continue
+            # เวลา (_s) ยิ่งน้อยยิ่งดี อัตรา (_rps) ยิ่งมากยิ่งดี
+            change = (value - before) / before if name.endswith("_s") else (before - value) / before
+            if abs(change) >= REGRESSION_THRESHOLD:
+                label = "REGRESSION" if change > 0 else "improvement"
+                print(f"  {label:<12}{size:>10}  {name:<40}{before:>12.4g} -> {value:<12.4g}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,100k")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-fit-rows", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--compare", action="store_true", help="compare with the most recent stored result")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "results": {},
+    }
+    for size in [parse_size(text) for text in args.sizes.split(",")]:
+        rec = Recorder(args.repeat)
+        with tempfile.TemporaryDirectory() as workdir:
+            csv_path = os.path.join(workdir, "accidents.csv")
+            generate_accidents(size, seed=0).to_csv(csv_path, index=False)
+            rec.record("ingest.csv_bytes", os.path.getsize(csv_path))
+            df = bench_ingest(rec, csv_path, workdir)
+            bench_aggregates(rec, df)
+            bench_forecast(rec, df)
+            classifier, sample = bench_models(rec, df, args.max_fit_rows)
+            bench_endpoints(rec, classifier, sample, args.requests, args.concurrency)
+
+        report["results"][str(size)] = rec.results
+        print(f"\n{size:,} rows")
+        for name, value in rec.results.items():
+            print(f"  {name:<40}{value:>14.4g}")
+
+    previous_paths = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")), key=os.path.getmtime)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{report['timestamp'].replace(':', '')}-{report['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nresults written to {os.path.relpath(path, ROOT)}")
+
+    if args.compare and previous_paths:
+        with open(previous_paths[-1], encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
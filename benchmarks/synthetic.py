@@ -0,0 +1,81 @@
+"""Synthetic accident data with the same schema as accident2021.csv.
+
+Usage: python benchmarks/synthetic.py ROWS OUTPUT.csv [--seed 0] [--start 2021-01-01] [--years 1]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+PROVINCES = (
+    'กรุงเทพมหานคร กระบี่ กาญจนบุรี กาฬสินธุ์ กำแพงเพชร ขอนแก่น จันทบุรี ฉะเชิงเทรา ชลบุรี ชัยนาท '
+    'ชัยภูมิ ชุมพร เชียงราย เชียงใหม่ ตรัง ตราด ตาก นครนายก นครปฐม นครพนม นครราชสีมา นครศรีธรรมราช '
+    'นครสวรรค์ นนทบุรี นราธิวาส น่าน บึงกาฬ บุรีรัมย์ ปทุมธานี ประจวบคีรีขันธ์ ปราจีนบุรี ปัตตานี '
+    'พระนครศรีอยุธยา พะเยา พังงา พัทลุง พิจิตร พิษณุโลก เพชรบุรี เพชรบูรณ์ แพร่ ภูเก็ต มหาสารคาม '
+    'มุกดาหาร แม่ฮ่องสอน ยโสธร ยะลา ร้อยเอ็ด ระนอง ระยอง ราชบุรี ลพบุรี ลำปาง ลำพูน เลย ศรีสะเกษ '
+    'สกลนคร สงขลา สตูล สมุทรปราการ สมุทรสงคราม สมุทรสาคร สระแก้ว สระบุรี สิงห์บุรี สุโขทัย สุพรรณบุรี '
+    'สุราษฎร์ธานี สุรินทร์ หนองคาย หนองบัวลำภู อ่างทอง อำนาจเจริญ อุดรธานี อุตรดิตถ์ อุทัยธานี อุบลราชธานี'
+).split()
+CAUSES = ['ขับรถเร็วเกินอัตราที่กำหนด', 'หลับใน', 'ตัดหน้ากระชั้นชิด', 'อุปกรณ์รถบกพร่อง', 'เมาสุรา',
+          'แซงรถอย่างผิดกฎหมาย', 'ฝ่าฝืนสัญญาณไฟ', 'ถนนลื่น', 'มองไม่เห็น', 'อื่นๆ']
+WEATHER = ['แจ่มใส', 'มืดครึ้ม', 'ฝนตก', 'มีหมอก', 'อื่นๆ']
+ROADS = ['ทางตรง', 'ทางโค้ง', 'ทางแยก', 'ทางลาดชัน', 'สะพาน', 'อื่นๆ']
+VEHICLES = ['รถจักรยานยนต์', 'รถยนต์นั่งส่วนบุคคล', 'รถปิคอัพบรรทุก4ล้อ', 'รถบรรทุก6ล้อ', 'รถอื่นๆ']
+SEVERITY = ['ผู้เสียชีวิต', 'ผู้บาดเจ็บสาหัส', 'ผู้บาดเจ็บเล็กน้อย']
+
+
+def _skewed(rng, n, k):
+    # ความถี่แบบ Zipf คร่าวๆ ให้บางหมวดพบบ่อยกว่าหมวดอื่นเหมือนข้อมูลจริง
+    weights = 1.0 / np.arange(1, k + 1)
+    return rng.choice(k, size=n, p=weights / weights.sum())
+
+
+def generate_accidents(n_rows, seed=0, start='2021-01-01', years=1, invalid_fraction=0.001):
+    """Raw accident rows as they appear in the CSV (Thai dates as dd/mm/YYYY, times as HH:MM)."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start, periods=int(365 * years), freq='D')
+    day_strings = np.asarray(days.strftime('%d/%m/%Y'), dtype=object)
+    time_strings = np.array([f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)], dtype=object)
+
+    provinces = _skewed(rng, n_rows, len(PROVINCES))
+    center_lat = rng.uniform(6.5, 19.5, len(PROVINCES))
+    center_lon = rng.uniform(98.0, 105.0, len(PROVINCES))
+
+    # ชั่วโมงเกิดเหตุหนาแน่นช่วงเย็น
+    hours = np.clip(rng.normal(17, 5, n_rows), 0, 23.99).astype(int)
+    minutes = rng.integers(0, 60, n_rows)
+
+    df = pd.DataFrame({
+        'วันที่เกิดเหตุ': day_strings[rng.integers(0, len(days), n_rows)],
+        'เวลา': time_strings[hours * 60 + minutes],
+        'จังหวัด': np.asarray(PROVINCES, dtype=object)[provinces],
+        'มูลเหตุสันนิษฐาน': np.asarray(CAUSES, dtype=object)[_skewed(rng, n_rows, len(CAUSES))],
+        'สภาพอากาศ': np.asarray(WEATHER, dtype=object)[_skewed(rng, n_rows, len(WEATHER))],
+        'บริเวณที่เกิดเหตุ': np.asarray(ROADS, dtype=object)[_skewed(rng, n_rows, len(ROADS))],
+        'LATITUDE': center_lat[provinces] + rng.normal(0, 0.3, n_rows),
+        'LONGITUDE': center_lon[provinces] + rng.normal(0, 0.3, n_rows),
+    })
+    for column, mean in zip(VEHICLES, [0.9, 0.5, 0.4, 0.1, 0.1]):
+        df[column] = rng.poisson(mean, n_rows).astype('int16')
+    for column, mean in zip(SEVERITY, [0.1, 0.2, 0.8]):
+        df[column] = rng.poisson(mean, n_rows).astype('int16')
+
+    # แถวที่วันที่ผิดรูปแบบ เหมือนข้อมูลจริงที่ต้องถูกตัดทิ้งตอน ingest
+    invalid = rng.random(n_rows) < invalid_fraction
+    df.loc[invalid, 'วันที่เกิดเหตุ'] = ''
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default="2021-01-01")
+    parser.add_argument("--years", type=float, default=1)
+    args = parser.parse_args()
+    generate_accidents(args.rows, args.seed, args.start, args.years).to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Out-of-core analytics for accident data that does not fit in memory.
+
+Everything here streams the source (a raw CSV or the partitioned store) in
+chunks, or pushes filters down into the Parquet scan, so peak memory depends
+on the chunk size and the size of the results, not on the number of rows.
+The aggregates are built from the same mergeable cubes as the in-memory path
+and therefore give identical results.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from aggregates import build_cube
+from ingest import DATE_COLUMN, PROVINCE_COLUMN, iter_accidents
+from spatial import (
+    MAX_RAW_POINTS, MIN_ZOOM, RAW_POINT_ZOOM, from_mercator, hexbin, merge_hexagons, to_mercator, viewport_bounds,
+)
+
+CHUNK_ROWS = int(os.environ.get("CHUNK_ROWS", 250_000))
+# ขนาดข้อมูลแบบไม่บีบอัด (MB) ที่เกินแล้วแดชบอร์ดจะไม่โหลดแถวดิบทั้งหมดเข้าหน่วยความจำ
+OUT_OF_CORE_THRESHOLD_MB = float(os.environ.get("OUT_OF_CORE_THRESHOLD_MB", 2048))
+MAX_DISPLAY_ROWS = 10_000
+
+PARTITION_COLUMNS = ["year", "month"]
+
+
+def store_dataset(store_dir):
+    return ds.dataset(os.path.join(store_dir, "data"), partitioning="hive")
+
+
+def iter_chunks(source, columns=None, chunk_rows=CHUNK_ROWS):
+    """Typed accident frames of about ``chunk_rows`` rows from a CSV file or a store directory."""
+    if os.path.isdir(source):
+        dataset = store_dataset(source)
+        columns = columns or [name for name in dataset.schema.names if name not in PARTITION_COLUMNS]
+        # ไฟล์ในแต่ละพาร์ทิชันมักเล็ก รวม batch ให้ได้ราว chunk_rows แถวก่อนแปลง เพื่อลดจำนวนรอบการรวม cube
+        pending, rows = [], 0
+        for batch in dataset.to_batches(columns=columns, batch_size=chunk_rows):
+            pending.append(batch)
+            rows += batch.num_rows
+            if rows >= chunk_rows:
+                yield pa.Table.from_batches(pending).to_pandas()
+                pending, rows = [], 0
+        if rows:
+            yield pa.Table.from_batches(pending).to_pandas()
+    else:
+        for chunk in iter_accidents(source, chunk_rows):
+            yield chunk if columns is None else chunk[columns]
+
+
+def estimated_bytes(source):
+    """In-memory size of the data, from the Parquet footers of a store or the size of a CSV."""
+    if not os.path.isdir(source):
+        return os.path.getsize(source)
+    total = 0
+    for fragment in store_dataset(source).get_fragments():
+        metadata = fragment.metadata
+        total += sum(metadata.row_group(i).total_byte_size for i in range(metadata.num_row_groups))
+    return total
+
+
+def use_out_of_core(source, threshold_mb=OUT_OF_CORE_THRESHOLD_MB):
+    return estimated_bytes(source) > threshold_mb * 2 ** 20
+
+
+def build_cube_chunked(source, chunk_rows=CHUNK_ROWS):
+    """Same cube as ``build_cube(load_frame(source))``, built one chunk at a time."""
+    cube = None
+    for chunk in iter_chunks(source, chunk_rows=chunk_rows):
+        part = build_cube(chunk)
+        cube = part if cube is None else cube.combine(part)
+    return cube
+
+
+class ChunkedSpatialIndex:
+    """The views of :class:`spatial.SpatialIndex` without keeping the raw points in memory.
+
+    Hexagon layers are counted chunk by chunk and merged; zoom levels
+    without a layer read only the points inside the viewport from the store.
+    Province centers are mean coordinates, since medians cannot be merged
+    across chunks. When ``layers`` and ``centers`` are passed in (the store
+    keeps both per drop) the store is not streamed at all.
+    """
+
+    def __init__(self, store_dir, zooms=range(MIN_ZOOM, RAW_POINT_ZOOM), chunk_rows=CHUNK_ROWS,
+                 layers=None, centers=None):
+        self.dataset = store_dataset(store_dir)
+        if layers is not None and centers is not None:
+            self.layers, self.centers = layers, centers
+            return
+        self.layers = {zoom: None for zoom in zooms}
+        sums = None
+        for chunk in iter_chunks(store_dir, [PROVINCE_COLUMN, 'LATITUDE', 'LONGITUDE'], chunk_rows):
+            chunk = chunk.dropna(subset=['LATITUDE', 'LONGITUDE'])
+            x, y = to_mercator(chunk['LATITUDE'], chunk['LONGITUDE'])
+            for zoom, layer in self.layers.items():
+                cells = hexbin(x, y, zoom)
+                self.layers[zoom] = cells if layer is None else merge_hexagons([layer, cells])
+
+            grouped = chunk.groupby(PROVINCE_COLUMN, observed=True)[['LATITUDE', 'LONGITUDE']]
+            part = grouped.sum().join(grouped.size().rename('n'))
+            part.index = part.index.astype(object)
+            sums = part if sums is None else sums.add(part, fill_value=0)
+        self.centers = sums[['LATITUDE', 'LONGITUDE']].div(sums['n'], axis=0).sort_index()
+
+    def view(self, center_lat, center_lon, zoom, width=1000, height=600):
+        """``('points', frame)`` with the raw rows, or ``('hexagons', frame)`` like ``SpatialIndex.view``."""
+        x0, y0, x1, y1 = viewport_bounds(center_lat, center_lon, zoom, width, height)
+        layer = self.layers.get(zoom)
+        if layer is not None:
+            inside = (layer['x'] >= x0) & (layer['x'] <= x1) & (layer['y'] >= y0) & (layer['y'] <= y1)
+            return 'hexagons', layer[inside]
+
+        # แกน y ของ mercator ชี้ลงใต้ y1 จึงเป็นขอบล่าง (ละติจูดต่ำสุด)
+        lat0, lon0 = from_mercator(x0, y1)
+        lat1, lon1 = from_mercator(x1, y0)
+        expression = ((pc.field('LATITUDE') >= float(lat0)) & (pc.field('LATITUDE') <= float(lat1))
+                      & (pc.field('LONGITUDE') >= float(lon0)) & (pc.field('LONGITUDE') <= float(lon1)))
+        if zoom >= RAW_POINT_ZOOM and self.dataset.count_rows(filter=expression) <= MAX_RAW_POINTS:
+            points = self.dataset.to_table(filter=expression).drop_columns(PARTITION_COLUMNS)
+            return 'points', points.to_pandas()
+        points = self.dataset.to_table(columns=['LATITUDE', 'LONGITUDE'], filter=expression)
+        x, y = to_mercator(points['LATITUDE'].to_numpy(), points['LONGITUDE'].to_numpy())
+        return 'hexagons', hexbin(x, y, zoom)
+
+
+def province_rows(store_dir, province, start=None, end=None, limit=MAX_DISPLAY_ROWS):
+    """Number of accidents in ``province`` within [start, end] and up to ``limit`` of those rows.
+
+    The province and date conditions are pushed down into the Parquet scan,
+    and the year partitions outside the range are skipped entirely.
+    """
+    dataset = store_dataset(store_dir)
+    expression = pc.field(PROVINCE_COLUMN) == province
+    if start is not None:
+        start = pd.Timestamp(start)
+        expression &= (pc.field('year') >= start.year) & (pc.field(DATE_COLUMN) >= start)
+    if end is not None:
+        end = pd.Timestamp(end)
+        expression &= (pc.field('year') <= end.year) & (pc.field(DATE_COLUMN) <= end)
+    count = dataset.count_rows(filter=expression)
+    rows = dataset.head(limit, filter=expression).drop_columns(PARTITION_COLUMNS).to_pandas()
+    return count, rows.sort_values(DATE_COLUMN, kind='stable', ignore_index=True)
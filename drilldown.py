@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+from ingest import DATE_COLUMN, PROVINCE_COLUMN, CAUSE_COLUMN
+
+
+class ProvinceIndex:
+    """Row positions of the raw frame grouped by province and sorted by date.
+
+    ``rows()`` slices a precomputed permutation, so a lookup costs
+    O(log n + result) instead of a boolean scan over the whole frame.
+    """
+
+    def __init__(self, df):
+        provinces = df[PROVINCE_COLUMN]
+        if provinces.dtype != 'category':
+            provinces = provinces.astype('category')
+        codes = provinces.cat.codes.to_numpy()
+        dates = df[DATE_COLUMN].to_numpy()
+
+        self.order = np.lexsort((dates, codes))
+        self.dates = dates[self.order]
+        self.provinces = provinces.cat.categories
+        self.offsets = np.searchsorted(codes[self.order], np.arange(len(self.provinces) + 1))
+
+    def bounds(self, province, start=None, end=None):
+        """``(lo, hi)`` such that ``order[lo:hi]`` are the rows for ``province`` within [start, end]."""
+        if province not in self.provinces:
+            return 0, 0
+        i = self.provinces.get_loc(province)
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        dates = self.dates[lo:hi]
+        if end is not None:
+            hi = lo + np.searchsorted(dates, np.datetime64(pd.Timestamp(end), 'us'), side='right')
+        if start is not None:
+            lo = lo + np.searchsorted(dates, np.datetime64(pd.Timestamp(start), 'us'), side='left')
+        return lo, hi
+
+    def rows(self, province, start=None, end=None):
+        """Positions of the rows for ``province``, optionally within [start, end]."""
+        lo, hi = self.bounds(province, start, end)
+        return self.order[lo:hi]
+
+
+class PartitionedProvinceIndex:
+    """:class:`ProvinceIndex` lookups over a frame concatenated from parts, one index per part.
+
+    ``offsets[i]`` is the position of the first row of part ``i`` in the
+    concatenated frame. Adding a part does not touch the indexes of the
+    others; a lookup merges the per-part results by date.
+    """
+
+    def __init__(self, indexes, offsets):
+        self.indexes = list(indexes)
+        self.offsets = list(offsets)
+
+    def rows(self, province, start=None, end=None):
+        positions, dates = [], []
+        for index, offset in zip(self.indexes, self.offsets):
+            lo, hi = index.bounds(province, start, end)
+            positions.append(index.order[lo:hi] + offset)
+            dates.append(index.dates[lo:hi])
+        if not positions:
+            return np.empty(0, dtype='int64')
+        order = np.argsort(np.concatenate(dates), kind='stable')
+        return np.concatenate(positions)[order]
+
+
+def province_stats(df):
+    """Per-province totals, cause counts and daily counts of raw rows, mergeable with ``combine_province_stats``.
+
+    ``totals`` also holds the coordinate sums of the located rows, from
+    which :func:`province_centers` takes the mean.
+    """
+    located = df['LATITUDE'].notna() & df['LONGITUDE'].notna()
+    frame = pd.DataFrame({
+        PROVINCE_COLUMN: df[PROVINCE_COLUMN],
+        'count': 1,
+        'deaths': df['ผู้เสียชีวิต'].astype('int64'),
+        'LATITUDE': df['LATITUDE'].where(located, 0.0),
+        'LONGITUDE': df['LONGITUDE'].where(located, 0.0),
+        'located': located.astype('int64'),
+    })
+    totals = frame.groupby(PROVINCE_COLUMN, observed=True).sum()
+    causes = df.groupby([PROVINCE_COLUMN, CAUSE_COLUMN], observed=True).size()
+    # วันที่ไม่มีจังหวัดยังนับในอนุกรมระดับประเทศ จึงเก็บแถว NaN ไว้
+    daily = df.groupby([df[PROVINCE_COLUMN], df[DATE_COLUMN].dt.normalize().rename('date')],
+                       observed=True, dropna=False).size()
+    return {'totals': _object_index(totals), 'causes': _object_index(causes), 'daily': _object_index(daily)}
+
+
+def combine_province_stats(stats):
+    """Merge the ``province_stats`` of disjoint sets of rows."""
+    stats = list(stats)
+    totals = pd.concat([part['totals'] for part in stats]).groupby(level=0).sum()
+    causes = pd.concat([part['causes'] for part in stats]).groupby(level=[0, 1]).sum()
+    daily = pd.concat([part['daily'] for part in stats]).groupby(level=[0, 1], dropna=False).sum()
+    return {'totals': _object_index(totals), 'causes': _object_index(causes), 'daily': _object_index(daily)}
+
+
+def _object_index(values):
+    if isinstance(values.index, pd.MultiIndex):
+        values.index = values.index.set_levels([level.astype(object) for level in values.index.levels])
+    else:
+        values.index = values.index.astype(object)
+    return values
+
+
+def province_centers(stats):
+    """Mean LATITUDE/LONGITUDE of the located rows of every province."""
+    totals = stats['totals']
+    totals = totals[totals['located'] > 0]
+    return totals[['LATITUDE', 'LONGITUDE']].div(totals['located'], axis=0).sort_index()
+
+
+def summaries_from_stats(stats):
+    """Same as :func:`province_summaries`, from merged ``province_stats``."""
+    totals = stats['totals'][['count', 'deaths']].rename(columns={'deaths': 'ผู้เสียชีวิต'})
+    return _summaries(totals, stats['causes'])
+
+
+def province_summaries(cube):
+    """Accident count, deaths and cause counts per province, read off the cube."""
+    frame = cube.frame
+    totals = frame.groupby(PROVINCE_COLUMN, observed=True)[['count', 'ผู้เสียชีวิต']].sum()
+    causes = frame.groupby([PROVINCE_COLUMN, CAUSE_COLUMN], observed=True)['count'].sum()
+    return _summaries(totals, causes)
+
+
+def _summaries(totals, causes):
+    causes = causes[causes > 0]
+    causes_by_province = {
+        province: group.droplevel(0).sort_values(ascending=False, kind='stable')
+        for province, group in causes.groupby(level=0, observed=True)
+    }
+
+    summaries = {}
+    for province, row in totals[totals['count'] > 0].sort_index().iterrows():
+        province_causes = causes_by_province.get(province, pd.Series(dtype='int64'))
+        province_causes.index = province_causes.index.astype(object)
+        summaries[province] = {
+            'count': int(row['count']),
+            'deaths': int(row['ผู้เสียชีวิต']),
+            'causes': province_causes,
+        }
+    return summaries
@@ -0,0 +1,58 @@
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
+
+from ingest import DATE_COLUMN, TIME_COLUMN, WEATHER_COLUMN, ROAD_COLUMN, VEHICLE_COLUMNS
+
+TIME_FEATURES = ['hour', 'day_of_week']
+
+
+def add_time_features(df):
+    """Derive the hour and day-of-week columns used by every model."""
+    df = df.copy(deep=False)
+    df['hour'] = df[TIME_COLUMN].dt.hour.astype('int8')
+    df['day_of_week'] = df[DATE_COLUMN].dt.dayofweek.astype('int8')
+    return df
+
+
+def make_preprocessor(numeric, categorical, encoding='onehot'):
+    """Column transformer for raw accident frames.
+
+    ``encoding='onehot'`` emits a scipy sparse matrix (for linear models),
+    ``encoding='ordinal'`` emits integer category codes (for tree models),
+    unseen categories map to all-zeros / -1 at transform time.
+    """
+    if encoding == 'onehot':
+        encoder = OneHotEncoder(handle_unknown='ignore', sparse_output=True, dtype=np.float32)
+    elif encoding == 'ordinal':
+        encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1,
+                                 encoded_missing_value=-2, dtype=np.float32)
+    else:
+        raise ValueError(f"Unknown encoding: {encoding}")
+
+    return ColumnTransformer(
+        [('numeric', 'passthrough', numeric), ('categorical', encoder, categorical)],
+        sparse_threshold=1.0,
+        verbose_feature_names_out=False,
+    )
+
+
+def regression_pipeline():
+    return Pipeline([
+        ('features', make_preprocessor(TIME_FEATURES, [WEATHER_COLUMN, ROAD_COLUMN], encoding='onehot')),
+        ('model', LinearRegression()),
+    ])
+
+
+def classifier_pipeline(n_estimators=100, random_state=42):
+    return Pipeline([
+        ('features', make_preprocessor(TIME_FEATURES + VEHICLE_COLUMNS, [WEATHER_COLUMN], encoding='ordinal')),
+        ('model', RandomForestClassifier(n_estimators=n_estimators, random_state=random_state)),
+    ])
+
+
+def feature_names(pipeline):
+    return list(pipeline.named_steps['features'].get_feature_names_out())
@@ -0,0 +1,57 @@
+"""Atomic file writes and memory-mapped Arrow IPC files, shared by the store and the caches."""
+import json
+import os
+from contextlib import contextmanager
+
+import joblib
+import pyarrow as pa
+
+
+@contextmanager
+def atomic_path(path):
+    """Yield a temporary path next to ``path``, moved over ``path`` once the block succeeds.
+
+    Readers therefore see either the old file or the complete new one, and
+    concurrent writers of the same file never share a temporary file.
+    """
+    directory, name = os.path.split(path)
+    # ชื่อไฟล์ชั่วคราวขึ้นต้นด้วย "." และลงท้ายด้วย .tmp จึงไม่ถูก glob หรือ pyarrow dataset อ่านระหว่างเขียน
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json(path, value, **kwargs):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f, **kwargs)
+
+
+def dump_joblib(value, path):
+    with atomic_path(path) as tmp_path:
+        joblib.dump(value, tmp_path)
+
+
+def write_arrow(df, path, preserve_index=False):
+    table = pa.Table.from_pandas(df, preserve_index=preserve_index)
+    with atomic_path(path) as tmp_path:
+        # IPC file แบบไม่บีบอัด เพื่อให้ memory-map อ่านได้โดยไม่ต้องคัดลอก
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def read_arrow_table(path):
+    """Arrow table whose buffers point into a read-only memory map of ``path``."""
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_arrow(path):
+    """DataFrame backed by the memory-mapped file where pyarrow can avoid a copy; treat it as read-only."""
+    return read_arrow_table(path).to_pandas(split_blocks=True)
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from fileio import dump_joblib
+from ingest import PROVINCE_COLUMN
+
+FORECAST_CACHE_DIR = os.path.join(".cache", "forecasts")
+NATIONAL = "ทั้งประเทศ"
+
+
+def daily_series_from_stats(stats):
+    """Daily accident counts for the whole country and for every province.
+
+    Built from merged ``drilldown.province_stats`` (kept per drop in the
+    store). Days without accidents are filled with 0 so every series has a
+    continuous daily index, which ARIMA needs for forecasting and for
+    appending new days.
+    """
+    counts = stats['daily']
+    national = counts.groupby(level=1).sum()
+    return _fill_days(national, counts[counts.index.get_level_values(0).notna()])
+
+
+def _fill_days(national, counts):
+    days = pd.date_range(national.index.min(), national.index.max(), freq='D')
+    series = {NATIONAL: national.reindex(days, fill_value=0).rename('count')}
+    for province, group in counts.groupby(level=0, observed=True):
+        series[province] = group.droplevel(0).reindex(days, fill_value=0).rename('count')
+    return series
+
+
+def _digest(series):
+    values = np.ascontiguousarray(series.to_numpy(dtype='float64'))
+    return hashlib.sha1(values.tobytes() + str(series.index[0]).encode()).hexdigest()
+
+
+def fit_series(series, order, state=None):
+    """Fit ARIMA on ``series``, or update ``state`` if the series only gained new days.
+
+    The update path appends the new observations to the previous results
+    without re-estimating the parameters, which is much cheaper than a fit.
+    Returns the new state.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    start = time.perf_counter()
+    warm = (
+        state is not None
+        and state['order'] == tuple(order)
+        and len(series) >= state['n']
+        and _digest(series.iloc[:state['n']]) == state['digest']
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if warm:
+            new = series.iloc[state['n']:]
+            results = state['results'].append(new) if len(new) else state['results']
+        else:
+            results = ARIMA(series, order=tuple(order)).fit()
+    return {
+        'results': results,
+        'order': tuple(order),
+        'n': len(series),
+        'digest': _digest(series),
+        'warm_start': warm,
+        'fit_seconds': time.perf_counter() - start,
+    }
+
+
+def _forecast_task(series, order, steps, state_path):
+    state = joblib.load(state_path) if os.path.exists(state_path) else None
+    state = fit_series(series, order, state)
+    dump_joblib(state, state_path)
+    return {
+        'forecast': state['results'].forecast(steps=steps),
+        'fit_seconds': state['fit_seconds'],
+        'warm_start': state['warm_start'],
+    }
+
+
+def backtest(series, order=(1, 1, 1), initial=None, horizon=7, step=7, refit=True):
+    """Rolling-origin evaluation of ARIMA on one series.
+
+    The model is trained on ``series[:origin]`` and scored on the next
+    ``horizon`` days, for origins every ``step`` days starting at ``initial``.
+    With ``refit=False`` the first fit is reused and only updated with new
+    days at each origin. Returns one row per origin with MAE, RMSE and fit time.
+    """
+    n = len(series)
+    initial = initial or max(n // 2, 30)
+    rows = []
+    state = None
+    for origin in range(initial, n - horizon + 1, step):
+        state = fit_series(series.iloc[:origin], order, None if refit else state)
+        actual = series.iloc[origin:origin + horizon].to_numpy(dtype='float64')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            predicted = np.asarray(state['results'].forecast(steps=horizon), dtype='float64')
+        errors = predicted - actual
+        rows.append({
+            'origin': series.index[origin],
+            'mae': float(np.mean(np.abs(errors))),
+            'rmse': float(np.sqrt(np.mean(errors ** 2))),
+            'fit_seconds': state['fit_seconds'],
+        })
+    return pd.DataFrame(rows)
+
+
+def _backtest_task(series, order, initial, horizon, step, refit):
+    return backtest(series, order, initial, horizon, step, refit)
+
+
+class Forecaster:
+    """Per-series ARIMA forecasts fitted in parallel and cached per data version.
+
+    The fitted state of every series is kept on disk across data versions;
+    when a series has only gained new days it is updated instead of refitted.
+    """
+
+    def __init__(self, cache_dir=FORECAST_CACHE_DIR, order=(1, 1, 1), max_workers=None):
+        self.cache_dir = cache_dir
+        self.order = tuple(order)
+        self.max_workers = max_workers
+
+    def _path(self, kind, *parts):
+        digest = hashlib.sha1(json.dumps([str(part) for part in parts]).encode()).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"{kind}-{digest}.joblib")
+
+    def forecast(self, series, version, steps=30):
+        """Forecast ``steps`` days for every series in the ``{name: series}`` mapping.
+
+        Returns ``{name: {'forecast', 'fit_seconds', 'warm_start'}}``.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        results, pending = {}, {}
+        for name in series:
+            path = self._path("forecast", name, version, self.order, steps)
+            if os.path.exists(path):
+                instrumentation.count("forecast", "hit")
+                results[name] = joblib.load(path)
+            else:
+                instrumentation.count("forecast", "miss")
+                pending[name] = path
+
+        if pending:
+            with ProcessPoolExecutor(self.max_workers) as executor:
+                futures = {
+                    name: executor.submit(_forecast_task, series[name], self.order, steps,
+                                          self._path("state", name, self.order))
+                    for name in pending
+                }
+                for name, future in futures.items():
+                    results[name] = future.result()
+                    # ฟิตในโปรเซสลูก จึงบันทึกเวลาที่โปรเซสลูกวัดไว้แทนการจับเวลาตรงนี้
+                    instrumentation.observe("fit", results[name]['fit_seconds'])
+                    dump_joblib(results[name], pending[name])
+        return {name: results[name] for name in series}
+
+    def backtest(self, series, version, horizon=7, step=7, initial=None, refit=True):
+        """Rolling-origin backtest for every series, in parallel. Returns one frame with a ``series`` column."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path("backtest", sorted(series), version, self.order, horizon, step, initial, refit)
+        if os.path.exists(path):
+            instrumentation.count("backtest", "hit")
+            return joblib.load(path)
+
+        instrumentation.count("backtest", "miss")
+        with ProcessPoolExecutor(self.max_workers) as executor:
+            futures = {
+                name: executor.submit(_backtest_task, values, self.order, initial, horizon, step, refit)
+                for name, values in series.items()
+            }
+            frames = [future.result().assign(series=name) for name, future in futures.items()]
+        report = pd.concat(frames, ignore_index=True)
+        for seconds in report['fit_seconds']:
+            instrumentation.observe("fit", seconds)
+        dump_joblib(report, path)
+        return report
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from fileio import read_arrow, write_arrow, write_json
+
+# คอลัมน์หลักของข้อมูลอุบัติเหตุ
+DATE_COLUMN = 'วันที่เกิดเหตุ'
+TIME_COLUMN = 'เวลา'
+PROVINCE_COLUMN = 'จังหวัด'
+CAUSE_COLUMN = 'มูลเหตุสันนิษฐาน'
+WEATHER_COLUMN = 'สภาพอากาศ'
+ROAD_COLUMN = 'บริเวณที่เกิดเหตุ'
+
+CATEGORY_COLUMNS = [PROVINCE_COLUMN, CAUSE_COLUMN, WEATHER_COLUMN, ROAD_COLUMN]
+VEHICLE_COLUMNS = ['รถจักรยานยนต์', 'รถยนต์นั่งส่วนบุคคล', 'รถปิคอัพบรรทุก4ล้อ', 'รถบรรทุก6ล้อ', 'รถอื่นๆ']
+SEVERITY_COLUMNS = ['ผู้เสียชีวิต', 'ผู้บาดเจ็บสาหัส', 'ผู้บาดเจ็บเล็กน้อย']
+COUNT_COLUMNS = VEHICLE_COLUMNS + SEVERITY_COLUMNS
+
+CACHE_DIR = ".cache"
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_accidents(source):
+    """Parse a raw accident CSV (path or buffer) into the typed frame used by the dashboard."""
+    return _prepare(pd.read_csv(source, dtype={column: "category" for column in CATEGORY_COLUMNS}))
+
+
+def iter_accidents(source, chunk_rows):
+    """Parse a raw accident CSV in chunks of ``chunk_rows`` rows, so it never has to fit in memory at once.
+
+    Each chunk is typed like :func:`parse_accidents`, except that the
+    categories and the integer widths are chosen per chunk.
+    """
+    reader = pd.read_csv(source, dtype={column: "category" for column in CATEGORY_COLUMNS}, chunksize=chunk_rows)
+    with reader:
+        for chunk in reader:
+            yield _prepare(chunk)
+
+
+def _prepare(df):
+    df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format='%d/%m/%Y', errors='coerce')
+    df[TIME_COLUMN] = pd.to_datetime(df[TIME_COLUMN], format='%H:%M', errors='coerce')
+    df = df.dropna(subset=[DATE_COLUMN, TIME_COLUMN])
+
+    # จำนวนรถและผู้บาดเจ็บเป็นจำนวนเต็มขนาดเล็ก เก็บเป็น unsigned int ที่เล็กที่สุดที่พอ
+    for column in COUNT_COLUMNS:
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors='coerce').fillna(0)
+            df[column] = pd.to_numeric(values.astype('int64'), downcast='unsigned')
+    return df.reset_index(drop=True)
+
+
+def _cache_paths(csv_path, cache_dir):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    base = os.path.join(cache_dir or os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_DIR), name)
+    return base + ".arrow", base + ".meta.json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def ensure_cache(csv_path, cache_dir=None):
+    """Build the Arrow cache for ``csv_path`` if it is missing or stale.
+
+    The cache is considered fresh when the CSV's mtime and size match the
+    stored metadata. If they differ the file is hashed, and the cache is only
+    rebuilt when the content hash changed too. Returns the cache metadata.
+    """
+    arrow_path, meta_path = _cache_paths(csv_path, cache_dir)
+    stat = os.stat(csv_path)
+    meta = _read_meta(meta_path)
+
+    if meta is not None and os.path.exists(arrow_path):
+        if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+            return meta
+        digest = file_hash(csv_path)
+        if meta["sha256"] == digest:
+            meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            write_json(meta_path, meta)
+            return meta
+    else:
+        digest = file_hash(csv_path)
+
+    df = parse_accidents(csv_path)
+    os.makedirs(os.path.dirname(arrow_path), exist_ok=True)
+    write_arrow(df, arrow_path)
+
+    meta = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest, "rows": len(df)}
+    write_json(meta_path, meta)
+    return meta
+
+
+def load_accidents(csv_path="accident2021.csv", cache_dir=None):
+    """Load the accident data through the memory-mapped Arrow cache."""
+    ensure_cache(csv_path, cache_dir)
+    arrow_path, _ = _cache_paths(csv_path, cache_dir)
+    return read_arrow(arrow_path)
@@ -0,0 +1,126 @@
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# สถิติของทั้งโปรเซส (ทุก session ของ Streamlit ใช้ร่วมกัน) แสดงในแผงดีบัก
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+
+
+def _rss_bytes():
+    # ขนาด resident set ปัจจุบัน ถ้าไม่มี /proc ใช้ค่าสูงสุดของโปรเซสแทน (ru_maxrss บน Linux มีหน่วยเป็นกิโลไบต์)
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def observe(stage, seconds, memory=0):
+    """Record one run of ``stage`` timed elsewhere, e.g. a fit reported back by a worker process."""
+    with _lock:
+        stats = _stages.setdefault(stage, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'memory': 0})
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['memory'] = max(stats['memory'], memory)
+
+
+@contextmanager
+def span(stage):
+    """Time one run of ``stage`` (load, fit, ...) and record how much it grew the resident set."""
+    baseline = _rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, max(_rss_bytes() - baseline, 0))
+
+
+def count(name, result, amount=1):
+    """Increment a cache counter, e.g. ``count("result_cache", "hit")``."""
+    with _lock:
+        _counters[(name, result)] = _counters.get((name, result), 0) + amount
+
+
+def stage_report():
+    with _lock:
+        rows = [{'stage': stage, **stats} for stage, stats in sorted(_stages.items())]
+    report = pd.DataFrame(rows, columns=['stage', 'count', 'seconds', 'max_seconds', 'memory'])
+    report['memory_growth_mb'] = report.pop('memory') / 2 ** 20
+    return report
+
+
+def cache_report():
+    with _lock:
+        counters = dict(_counters)
+    report = pd.Series(counters, dtype='int64')
+    if report.empty:
+        return pd.DataFrame(columns=['hit', 'miss'])
+    return report.unstack(fill_value=0).rename_axis('cache')
+
+
+class RenderTimer:
+    """Wall time (and optionally peak memory) per section of a Streamlit page.
+
+    Call ``lap(name)`` where each section starts; the previous section ends
+    there. ``render`` shows the table, e.g. in the sidebar. When disabled
+    every call is a no-op, so the timer can stay in the page permanently.
+    """
+
+    def __init__(self, enabled=False, trace_memory=False):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.rows = []
+        self._name = None
+        # เริ่ม/หยุด tracemalloc เฉพาะเมื่อเป็นผู้เริ่มเอง เพื่อไม่รบกวนตัววัดอื่นในโปรเซส
+        self._owns_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+        self._page_start = self._start
+
+    def lap(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._name is not None:
+            row = {'section': self._name, 'seconds': now - self._start}
+            if self.trace_memory:
+                row['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            self.rows.append(row)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self._name = name
+        self._start = time.perf_counter()
+
+    def finish(self):
+        """Close the last section and return the timings as a frame."""
+        if not self.enabled:
+            return None
+        self.lap(None)
+        report = pd.DataFrame(self.rows)
+        report.loc[len(report)] = {'section': 'ทั้งหน้า', 'seconds': time.perf_counter() - self._page_start}
+        return report
+
+    def render(self, container):
+        report = self.finish()
+        if report is None:
+            return
+        if self._owns_tracing:
+            tracemalloc.stop()
+        # ru_maxrss บน Linux มีหน่วยเป็นกิโลไบต์
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+        container.subheader("เวลาเรนเดอร์แต่ละส่วน")
+        container.dataframe(report)
+        container.write(f"หน่วยความจำสูงสุดของโปรเซส: {max_rss:.0f} MB")
+        container.subheader("ขั้นตอนที่วัดเวลาไว้ (ทั้งโปรเซส)")
+        container.dataframe(stage_report())
+        container.subheader("การเรียกใช้แคช (hit/miss)")
+        container.dataframe(cache_report())
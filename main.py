@@ -32,65 +32,149 @@
 # else:
 #     st.warning("Please select at least one column.")
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from store import STORE_DIR, read_manifest, sync_store, load_store, load_store_summary, load_province_index
+from spatial import SpatialIndex, MIN_ZOOM, MAX_ZOOM
+from drilldown import province_centers, summaries_from_stats
+from chunked import MAX_DISPLAY_ROWS, ChunkedSpatialIndex, province_rows, use_out_of_core
+from instrumentation import RenderTimer
+from result_cache import ResultCache
+
 
 # Set page config
 st.set_page_config(page_title="การวิเคราะห์ข้อมูลอุบัติเหตุปี 2021-2024", layout="wide")
 
-# Load data function
-@st.cache_data
-def load_data():
-    df = pd.read_csv("accident2021.csv")
-    df['วันที่เกิดเหตุ'] = pd.to_datetime(df['วันที่เกิดเหตุ'], format='%d/%m/%Y', errors='coerce')
-    df['เวลา'] = pd.to_datetime(df['เวลา'], format='%H:%M', errors='coerce')
-    df = df.dropna(subset=['วันที่เกิดเหตุ', 'เวลา'])
-    return df
+# แผงดีบัก: เวลาเรนเดอร์ของแต่ละส่วนในหน้า (ปิดไว้เป็นค่าเริ่มต้น)
+debug = st.sidebar.checkbox("แสดงเวลาเรนเดอร์ (debug)")
+timer = RenderTimer(debug, trace_memory=debug and st.sidebar.checkbox("วัดหน่วยความจำด้วย tracemalloc"))
+timer.lap("โหลดข้อมูล")
+
+# ผลลัพธ์ทั้งหมดเก็บใน result cache บนดิสก์ที่ทุกโปรเซสในเครื่องใช้ร่วมกันและอ่านผ่าน memory-map
+# st.cache_resource เก็บเพียงออบเจกต์ที่ชี้ไปยังแคชนั้นต่อโปรเซส ไม่คัดลอกข้อมูลทุกครั้งที่ rerun แบบ st.cache_data
+# ผลลัพธ์จากแคชเป็นแบบอ่านอย่างเดียว ห้ามแก้ไขในที่
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
 
-df = load_data()
+results = get_result_cache()
+
+# Load data function
+@st.cache_resource
+def load_data(version):
+    # อ่านจาก store ที่แบ่งพาร์ทิชันตามปี/เดือน (ไฟล์ CSV ใหม่ใน data/drops จะถูกเพิ่มเข้า store อัตโนมัติ)
+    # ไฟล์ Arrow ของ store ถูก memory-map อยู่แล้ว จึงไม่เก็บสำเนาซ้ำใน result cache
+    return load_store(STORE_DIR)
+
+# store เก็บสรุปของแต่ละ drop ไว้ตั้งแต่ตอน ingest: อนุกรมของกราฟ, สถิติรายจังหวัด และชั้นหกเหลี่ยมระดับซูมหยาบ
+# เวอร์ชันใหม่จึงแค่รวมสรุปเหล่านี้ (ขนาดเล็ก) ไม่ต้องอ่านหรือรวมแถวของ drop เก่าซ้ำ
+@st.cache_resource
+def load_summary(version):
+    return results.get_or_compute("store_summary", version, lambda: load_store_summary(STORE_DIR))
+
+# ข้อมูลที่ใหญ่เกิน OUT_OF_CORE_THRESHOLD_MB จะไม่ถูกโหลดเข้าหน่วยความจำทั้งก้อน
+# กราฟยังใช้สรุปชุดเดิม ส่วนแผนที่และรายการแถวอ่านจาก store แบบทีละส่วน
+@st.cache_resource
+def is_out_of_core(version):
+    return use_out_of_core(STORE_DIR)
+
+version = sync_store()
+if not read_manifest(STORE_DIR)["files"]:
+    st.warning("ยังไม่มีข้อมูลอุบัติเหตุ: วางไฟล์ CSV ลงใน data/drops แล้วโหลดหน้าใหม่ (ไฟล์ที่ถูกปฏิเสธดูได้ใน data/accidents/_manifest.json)")
+    st.stop()
+out_of_core = is_out_of_core(version)
+df = None if out_of_core else load_data(version)
+store_summary = load_summary(version)
+charts = store_summary['marginals']
+
+# ชั้นหกเหลี่ยมระดับซูมหยาบรวมมาจากแต่ละ drop แล้ว เหลือสร้างเพียงดัชนีพิกัดของแถวดิบ ครั้งเดียวต่อเวอร์ชันข้อมูล
+# ระดับซูมที่ละเอียดกว่านั้นสร้างหกเหลี่ยมเฉพาะจุดในหน้าจอจากดัชนีนี้
+# จุดศูนย์กลางจังหวัดเป็นค่าเฉลี่ยพิกัดจากสถิติรายจังหวัด เหมือนกันทั้งสองโหมด
+def build_spatial_index(version):
+    df = load_data(version)
+    return SpatialIndex(df['LATITUDE'], df['LONGITUDE'], layers=load_summary(version)['layers'])
+
+@st.cache_resource
+def load_spatial_index(version):
+    return results.get_or_compute("spatial_index", version, lambda: build_spatial_index(version))
+
+@st.cache_resource
+def load_chunked_spatial_index(version):
+    summary = load_summary(version)
+    return ChunkedSpatialIndex(STORE_DIR, layers=summary['layers'], centers=province_centers(summary['stats']))
+
+map_centers = province_centers(store_summary['stats'])
+if out_of_core:
+    spatial_index = load_chunked_spatial_index(version)
+else:
+    spatial_index = load_spatial_index(version)
 
 st.title("การวิเคราะห์ข้อมูลอุบัติเหตุปี 2021-2024")
 
 # 1. Analysis of accident trends
+timer.lap("1. การวิเคราะห์แนวโน้มอุบัติเหตุ")
 st.header("1. การวิเคราะห์แนวโน้มอุบัติเหตุ")
 
 # Daily trend
-daily_accidents = df['วันที่เกิดเหตุ'].dt.date.value_counts().sort_index()
+daily_accidents = charts.daily()
 fig = px.line(x=daily_accidents.index, y=daily_accidents.values, 
               title="ความถี่ของอุบัติเหตุรายวัน",
               labels={"x": "วันที่", "y": "จำนวนอุบัติเหตุ"})
 st.plotly_chart(fig)
 
 # Hourly trend
-hourly_accidents = df['เวลา'].dt.hour.value_counts().sort_index()
+hourly_accidents = charts.hourly()
 fig = px.bar(x=hourly_accidents.index, y=hourly_accidents.values, 
              title="ความถี่ของอุบัติเหตุรายชั่วโมง",
              labels={"x": "ชั่วโมง", "y": "จำนวนอุบัติเหตุ"})
 st.plotly_chart(fig)
 
 # 2. Identification of high-risk areas
+timer.lap("2. การระบุพื้นที่เสี่ยง")
 st.header("2. การระบุพื้นที่เสี่ยง")
 
 # Map of accident locations
 st.subheader("แผนที่แสดงตำแหน่งที่เกิดอุบัติเหตุ")
-fig = px.scatter_mapbox(df, lat="LATITUDE", lon="LONGITUDE", zoom=3, 
-                        mapbox_style="open-street-map")
+map_col1, map_col2 = st.columns(2)
+with map_col1:
+    map_zoom = st.slider("ระดับการซูม", MIN_ZOOM, MAX_ZOOM, 5)
+with map_col2:
+    map_center = st.selectbox("จุดศูนย์กลางแผนที่", ["ทั้งประเทศ"] + list(map_centers.index))
+
+if map_center == "ทั้งประเทศ":
+    center_lat, center_lon = 13.0, 101.0
+else:
+    center_lat, center_lon = map_centers.loc[map_center]
+
+# แสดงจุดจริงเฉพาะเมื่อซูมใกล้พอ นอกนั้นรวมเป็นหกเหลี่ยม จำนวนจุดบนแผนที่จึงมีขอบเขตเสมอ
+kind, view = spatial_index.view(center_lat, center_lon, map_zoom)
+if kind == 'points':
+    # โหมด out-of-core คืนแถวจริงมาเลย โหมดปกติคืนตำแหน่งแถวใน df
+    points = view if out_of_core else df.iloc[view]
+    fig = px.scatter_mapbox(points, lat="LATITUDE", lon="LONGITUDE", zoom=map_zoom,
+                            center={"lat": center_lat, "lon": center_lon},
+                            mapbox_style="open-street-map")
+else:
+    fig = px.scatter_mapbox(view, lat="LATITUDE", lon="LONGITUDE", size="count", color="count",
+                            zoom=map_zoom, center={"lat": center_lat, "lon": center_lon},
+                            mapbox_style="open-street-map")
 fig.update_layout(height=600)
 st.plotly_chart(fig)
 
 # Road characteristics
-road_char = df['บริเวณที่เกิดเหตุ'].value_counts()
+road_char = charts.counts_by('บริเวณที่เกิดเหตุ')
 fig = px.pie(values=road_char.values, names=road_char.index, 
              title="ความถี่ของอุบัติเหตุตามลักษณะถนน")
 st.plotly_chart(fig)
 
 # 3. Analysis of accident causes
+timer.lap("3. การวิเคราะห์สาเหตุของอุบัติเหตุ")
 st.header("3. การวิเคราะห์สาเหตุของอุบัติเหตุ")
 
 # Suspected causes
-causes = df['มูลเหตุสันนิษฐาน'].value_counts().reset_index()
+cause_counts = charts.counts_by('มูลเหตุสันนิษฐาน')
+causes = cause_counts.reset_index()
 causes.columns = ['สาเหตุ', 'จำนวน']
 fig = px.bar(causes, x='จำนวน', y='สาเหตุ', orientation='h',
              title='ความถี่ของสาเหตุที่สันนิษฐาน',
@@ -99,45 +183,49 @@ fig.update_layout(height=800)
 st.plotly_chart(fig)
 
 # Weather conditions
-weather = df['สภาพอากาศ'].value_counts().reset_index()
+weather = charts.counts_by('สภาพอากาศ').reset_index()
 weather.columns = ['สภาพอากาศ', 'จำนวน']
 fig = px.pie(weather, values='จำนวน', names='สภาพอากาศ', 
              title='อุบัติเหตุตามสภาพอากาศ')
 st.plotly_chart(fig)
 
 # 4. Analysis of vehicle types
+timer.lap("4. การวิเคราะห์ประเภทยานพาหนะ")
 st.header("4. การวิเคราะห์ประเภทยานพาหนะ")
 
 vehicle_columns = ['รถจักรยานยนต์', 'รถยนต์นั่งส่วนบุคคล', 'รถปิคอัพบรรทุก4ล้อ', 'รถบรรทุก6ล้อ', 'รถอื่นๆ']
-vehicle_counts = df[vehicle_columns].sum().sort_values(ascending=False)
+vehicle_counts = charts.totals(vehicle_columns).sort_values(ascending=False)
 fig = px.bar(x=vehicle_counts.index, y=vehicle_counts.values,
              title="ความถี่ของประเภทยานพาหนะในอุบัติเหตุ",
              labels={"x": "ประเภทยานพาหนะ", "y": "จำนวนอุบัติเหตุ"})
 st.plotly_chart(fig)
 
 # 5. Analysis of accident severity
+timer.lap("5. การวิเคราะห์ความรุนแรงของอุบัติเหตุ")
 st.header("5. การวิเคราะห์ความรุนแรงของอุบัติเหตุ")
 
 severity_columns = ['ผู้เสียชีวิต', 'ผู้บาดเจ็บสาหัส', 'ผู้บาดเจ็บเล็กน้อย']
-severity_data = df[severity_columns].sum()
+severity_data = charts.totals(severity_columns)
 fig = px.bar(x=severity_data.index, y=severity_data.values,
              title="ความรุนแรงของอุบัติเหตุ",
              labels={"x": "ประเภทความรุนแรง", "y": "จำนวนคน"})
 st.plotly_chart(fig)
 
 # Correlation between vehicle types and severity
-correlation = df[vehicle_columns + severity_columns].corr()
+correlation = charts.correlation(vehicle_columns + severity_columns)
 fig = px.imshow(correlation, 
                 title="ความสัมพันธ์ระหว่างประเภทยานพาหนะและความรุนแรงของอุบัติเหตุ")
 st.plotly_chart(fig)
 
 
 # 6. Accident prevention and reduction planning
+timer.lap("6. การวางแผนป้องกันและลดอุบัติเหตุ")
 st.header("6. การวางแผนป้องกันและลดอุบัติเหตุ")
 
 # พื้นที่ที่มีอุบัติเหตุบ่อย
 st.subheader("พื้นที่ที่มีอุบัติเหตุบ่อย")
-top_accident_locations = df['จังหวัด'].value_counts().head(10)
+province_counts = charts.counts_by('จังหวัด')
+top_accident_locations = province_counts.head(10)
 fig = px.bar(x=top_accident_locations.index, y=top_accident_locations.values,
              title="10 จังหวัดที่มีอุบัติเหตุมากที่สุด",
              labels={"x": "จังหวัด", "y": "จำนวนอุบัติเหตุ"})
@@ -145,8 +233,6 @@ st.plotly_chart(fig)
 
 # ช่วงเวลาที่เกิดอุบัติเหตุมาก
 st.subheader("ช่วงเวลาที่เกิดอุบัติเหตุมาก")
-df['hour'] = df['เวลา'].dt.hour
-hourly_accidents = df['hour'].value_counts().sort_index()
 fig = px.line(x=hourly_accidents.index, y=hourly_accidents.values,
               title="จำนวนอุบัติเหตุตามช่วงเวลา",
               labels={"x": "ชั่วโมง", "y": "จำนวนอุบัติเหตุ"})
@@ -154,20 +240,21 @@ st.plotly_chart(fig)
 
 # สาเหตุหลักของอุบัติเหตุ
 st.subheader("สาเหตุหลักของอุบัติเหตุ")
-top_causes = df['มูลเหตุสันนิษฐาน'].value_counts().head(5)
+top_causes = cause_counts.head(5)
 fig = px.pie(values=top_causes.values, names=top_causes.index,
              title="5 สาเหตุหลักของอุบัติเหตุ")
 st.plotly_chart(fig)
 
 # ประเภทยานพาหนะที่มีความเสี่ยงสูง
 st.subheader("ประเภทยานพาหนะที่มีความเสี่ยงสูง")
-vehicle_risk = df[vehicle_columns].sum().sort_values(ascending=False)
+vehicle_risk = vehicle_counts
 fig = px.bar(x=vehicle_risk.index, y=vehicle_risk.values,
              title="ความเสี่ยงของประเภทยานพาหนะ",
              labels={"x": "ประเภทยานพาหนะ", "y": "จำนวนอุบัติเหตุ"})
 st.plotly_chart(fig)
 
 # 7. Predictive modeling
+timer.lap("7. การสร้างแบบจำลองทำนาย")
 st.header("7. การสร้างแบบจำลองทำนาย")
 
 # ตัวอย่างการเตรียมข้อมูลสำหรับการสร้างแบบจำลอง
@@ -188,43 +275,70 @@ st.write("""
 
 # ตัวอย่างการวิเคราะห์แนวโน้มเชิงเวลา
 st.subheader("ตัวอย่างการวิเคราะห์แนวโน้มเชิงเวลา")
-df['date'] = df['วันที่เกิดเหตุ'].dt.date
-daily_accidents = df.groupby('date').size().reset_index(name='count')
+daily_accidents = daily_accidents.rename_axis('date').reset_index(name='count')
 fig = px.line(daily_accidents, x='date', y='count',
               title="แนวโน้มจำนวนอุบัติเหตุรายวัน",
               labels={"date": "วันที่", "count": "จำนวนอุบัติเหตุ"})
 st.plotly_chart(fig)
 
 # 8. Detailed reporting and data presentation
+timer.lap("8. การจัดทำรายงานและการนำเสนอข้อมูลโดยละเอียด")
 st.header("8. การจัดทำรายงานและการนำเสนอข้อมูลโดยละเอียด")
 
 # สร้างแดชบอร์ดแบบโต้ตอบ
 st.subheader("แดชบอร์ดแบบโต้ตอบ")
 st.write("เลือกจังหวัดเพื่อดูข้อมูลเชิงลึก:")
-selected_province = st.selectbox("เลือกจังหวัด", df['จังหวัด'].unique())
 
-province_data = df[df['จังหวัด'] == selected_province]
+# ดัชนีแถวตามจังหวัด/วันที่ และสรุปรายจังหวัดคำนวณไว้ล่วงหน้าแยกตาม drop การเปลี่ยนจังหวัดจึงไม่ต้องสแกนข้อมูลทั้งหมด
+@st.cache_resource
+def load_summaries(version):
+    return summaries_from_stats(load_summary(version)['stats'])
+
+# ดัชนีแถวมีขนาดตามจำนวนแถว โหลด (แบบ memory-map) เฉพาะโหมดที่มีแถวทั้งหมดในหน่วยความจำ
+@st.cache_resource
+def load_drilldown_index(version):
+    return load_province_index(STORE_DIR)
+
+summaries = load_summaries(version)
+province_index = None if out_of_core else load_drilldown_index(version)
+selected_province = st.selectbox("เลือกจังหวัด", list(summaries))
+summary = summaries[selected_province]
 
 col1, col2 = st.columns(2)
 
 with col1:
     # จำนวนอุบัติเหตุในจังหวัดที่เลือก
-    st.metric("จำนวนอุบัติเหตุทั้งหมด", len(province_data))
+    st.metric("จำนวนอุบัติเหตุทั้งหมด", summary['count'])
 
 with col2:
     # จำนวนผู้เสียชีวิตในจังหวัดที่เลือก
-    st.metric("จำนวนผู้เสียชีวิต", province_data['ผู้เสียชีวิต'].sum())
+    st.metric("จำนวนผู้เสียชีวิต", summary['deaths'])
 
 # กราฟแสดงสาเหตุของอุบัติเหตุในจังหวัดที่เลือก
-causes_in_province = province_data['มูลเหตุสันนิษฐาน'].value_counts()
+causes_in_province = summary['causes']
 fig = px.pie(values=causes_in_province.values, names=causes_in_province.index,
              title=f"สาเหตุของอุบัติเหตุใน{selected_province}")
 st.plotly_chart(fig)
 
+# รายการอุบัติเหตุในจังหวัดที่เลือกตามช่วงวันที่
+first_day = daily_accidents['date'].min().date()
+last_day = daily_accidents['date'].max().date()
+date_range = st.date_input("ช่วงวันที่", (first_day, last_day), min_value=first_day, max_value=last_day)
+if len(date_range) == 2 and out_of_core:
+    # อ่านเฉพาะแถวของจังหวัดและช่วงวันที่ที่เลือกจาก Parquet แสดงไม่เกิน MAX_DISPLAY_ROWS แถว
+    row_count, selected_rows = province_rows(STORE_DIR, selected_province, *date_range)
+    st.write(f"อุบัติเหตุใน{selected_province} ช่วงที่เลือก: {row_count} ครั้ง")
+    st.dataframe(selected_rows)
+elif len(date_range) == 2:
+    selected_rows = province_index.rows(selected_province, *date_range)
+    st.write(f"อุบัติเหตุใน{selected_province} ช่วงที่เลือก: {len(selected_rows)} ครั้ง")
+    # ส่งไปยังเบราว์เซอร์ไม่เกิน MAX_DISPLAY_ROWS แถวเหมือนโหมด out-of-core
+    st.dataframe(df.iloc[selected_rows[:MAX_DISPLAY_ROWS]])
+
 # วิเคราะห์แนวโน้มระยะยาว
 st.subheader("วิเคราะห์แนวโน้มระยะยาว")
-monthly_accidents = df.groupby(df['วันที่เกิดเหตุ'].dt.to_period('M')).size().reset_index(name='count')
-monthly_accidents['date'] = monthly_accidents['วันที่เกิดเหตุ'].dt.to_timestamp()
+monthly_accidents = charts.monthly().reset_index(name='count')
+monthly_accidents['date'] = monthly_accidents['date'].dt.to_timestamp()
 fig = px.line(monthly_accidents, x='date', y='count',
               title="แนวโน้มจำนวนอุบัติเหตุรายเดือน",
               labels={"date": "เดือน", "count": "จำนวนอุบัติเหตุ"})
@@ -232,7 +346,7 @@ st.plotly_chart(fig)
 
 # เปรียบเทียบข้อมูลระหว่างภูมิภาค
 st.subheader("เปรียบเทียบข้อมูลระหว่างภูมิภาค")
-region_accidents = df.groupby('จังหวัด').size().sort_values(ascending=False).head(10)
+region_accidents = top_accident_locations
 fig = px.bar(x=region_accidents.index, y=region_accidents.values,
              title="10 จังหวัดที่มีอุบัติเหตุมากที่สุด",
              labels={"x": "จังหวัด", "y": "จำนวนอุบัติเหตุ"})
@@ -244,4 +358,6 @@ st.write("""
 - จัดสรรทรัพยากรในการป้องกันและรับมือกับอุบัติเหตุได้อย่างเหมาะสม
 - สร้างความตระหนักรู้ให้กับประชาชนเกี่ยวกับความปลอดภัยบนท้องถนน
 - ปรับปรุงโครงสร้างพื้นฐานและระบบจราจรให้มีความปลอดภัยมากขึ้น
-""")
\ No newline at end of file
+""")
+
+timer.render(st.sidebar)
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""Disk-backed result cache shared by every dashboard process on the host.
+
+DataFrames are stored as uncompressed Arrow IPC files and read back through a
+memory map, so the column buffers of every process point at the same pages
+of the OS page cache instead of each holding a private copy. Other results
+(cubes, indexes, fitted models) are stored with joblib and loaded with
+``mmap_mode="r"``, which memory-maps their numpy arrays the same way.
+Loaded results are therefore shared and must be treated as read-only.
+
+Entries are keyed by name, data version and parameters, and the least
+recently used entries are evicted once the cache grows beyond ``max_bytes``.
+"""
+import fcntl
+import glob
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+import joblib
+import pandas as pd
+
+import instrumentation
+from fileio import dump_joblib, read_arrow, write_arrow
+
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(".cache", "results"))
+RESULT_CACHE_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", 4096))
+
+
+class ResultCache:
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_MB * 2 ** 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _base(self, name, version, params):
+        payload = json.dumps([version, params], sort_keys=True, default=str)
+        return os.path.join(self.cache_dir, f"{name}-{hashlib.sha1(payload.encode()).hexdigest()[:20]}")
+
+    @contextmanager
+    def _lock(self, path):
+        with open(path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _read(self, base):
+        for path, reader in ((base + ".arrow", read_arrow), (base + ".joblib", _read_object)):
+            try:
+                value = reader(path)
+            except FileNotFoundError:
+                continue
+            # mtime เป็นเวลาที่ใช้ล่าสุด สำหรับการลบแบบ LRU
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            return True, value
+        return False, None
+
+    def get(self, name, version, params=None):
+        """Return ``(found, value)`` for a cached result."""
+        return self._read(self._base(name, version, params))
+
+    def put(self, name, version, value, params=None):
+        """Store ``value`` and return it loaded back from the cache (memory-mapped, read-only)."""
+        base = self._base(name, version, params)
+        if isinstance(value, pd.DataFrame):
+            write_arrow(value, base + ".arrow", preserve_index=True)
+        else:
+            dump_joblib(value, base + ".joblib")
+        self.evict()
+        # ผลลัพธ์ที่ใหญ่กว่าขนาดแคชทั้งหมดถูกลบทันที คืนค่าที่คำนวณได้ไปตรงๆ
+        found, stored = self._read(base)
+        return stored if found else value
+
+    def get_or_compute(self, name, version, compute, params=None):
+        """Cached result of ``compute()`` for this data version, computed by only one process at a time.
+
+        Other processes asking for the same entry wait for it and then read
+        the stored result instead of computing it again.
+        """
+        found, value = self.get(name, version, params)
+        if found:
+            instrumentation.count("result_cache", "hit")
+            return value
+        base = self._base(name, version, params)
+        with self._lock(base + ".lock"):
+            found, value = self._read(base)
+            if found:
+                instrumentation.count("result_cache", "hit")
+                return value
+            instrumentation.count("result_cache", "miss")
+            with instrumentation.span(name):
+                value = compute()
+            return self.put(name, version, value, params)
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits in ``max_bytes``."""
+        with self._lock(os.path.join(self.cache_dir, ".lock")):
+            entries = []
+            for path in glob.glob(os.path.join(self.cache_dir, "*.arrow")) + glob.glob(
+                    os.path.join(self.cache_dir, "*.joblib")):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                # โปรเซสที่ memory-map ไฟล์นี้อยู่ยังอ่านต่อได้ เพราะไฟล์ถูกลบจริงเมื่อปิด map แล้วเท่านั้น
+                for stale in (path, os.path.splitext(path)[0] + ".lock"):
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+
+def _read_object(path):
+    return joblib.load(path, mmap_mode="r")
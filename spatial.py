@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+TILE_SIZE = 256
+HEX_PIXELS = 12
+MIN_ZOOM = 3
+RAW_POINT_ZOOM = 11
+MAX_ZOOM = 16
+MAX_RAW_POINTS = 5000
+
+SQRT3 = np.sqrt(3.0)
+
+
+def to_mercator(lat, lon):
+    """Project lat/lon degrees to web-mercator world coordinates in [0, 1]."""
+    lat = np.clip(np.asarray(lat, dtype='float64'), -85.05112878, 85.05112878)
+    x = (np.asarray(lon, dtype='float64') + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(np.radians(lat)) + 1.0 / np.cos(np.radians(lat))) / np.pi) / 2.0
+    return x, y
+
+
+def from_mercator(x, y):
+    lon = np.asarray(x) * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * np.asarray(y)))))
+    return lat, lon
+
+
+def viewport_bounds(center_lat, center_lon, zoom, width=1000, height=600):
+    """Mercator (x0, y0, x1, y1) box visible in a map of ``width`` x ``height`` pixels."""
+    cx, cy = to_mercator(center_lat, center_lon)
+    world_pixels = TILE_SIZE * 2.0 ** zoom
+    half_w, half_h = width / 2.0 / world_pixels, height / 2.0 / world_pixels
+    return float(cx - half_w), float(cy - half_h), float(cx + half_w), float(cy + half_h)
+
+
+def hexbin(x, y, zoom, hex_pixels=HEX_PIXELS):
+    """Count mercator points per pointy-top hexagon sized ``hex_pixels`` at ``zoom``.
+
+    Returns a frame with the hexagon centers (LATITUDE/LONGITUDE) and counts.
+    """
+    size = hex_pixels / (TILE_SIZE * 2.0 ** zoom)
+    q = (SQRT3 / 3.0 * x - y / 3.0) / size
+    r = (2.0 / 3.0 * y) / size
+
+    # ปัดเศษพิกัด cube ให้ได้หกเหลี่ยมที่ใกล้ที่สุด
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+
+    keys = np.stack([rq.astype('int64'), rr.astype('int64')], axis=1)
+    cells, counts = np.unique(keys, axis=0, return_counts=True)
+    hx = size * (SQRT3 * cells[:, 0] + SQRT3 / 2.0 * cells[:, 1])
+    hy = size * (1.5 * cells[:, 1])
+    lat, lon = from_mercator(hx, hy)
+    return pd.DataFrame({'LATITUDE': lat, 'LONGITUDE': lon, 'x': hx, 'y': hy, 'count': counts})
+
+
+def hexagon_layers(lat, lon, zooms=range(MIN_ZOOM, RAW_POINT_ZOOM)):
+    """``{zoom: hexbin frame}`` of the points with valid coordinates."""
+    lat, lon = np.asarray(lat, dtype='float64'), np.asarray(lon, dtype='float64')
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    x, y = to_mercator(lat[valid], lon[valid])
+    return {zoom: hexbin(x, y, zoom) for zoom in zooms}
+
+
+def merge_hexagons(frames):
+    """Sum the counts of hexbin frames of the same zoom built from disjoint sets of points."""
+    merged = pd.concat(frames, ignore_index=True)
+    return merged.groupby(['LATITUDE', 'LONGITUDE', 'x', 'y'], as_index=False, sort=False)['count'].sum()
+
+
+def merge_layers(layers):
+    """Merge several ``{zoom: hexbin frame}`` layer sets, e.g. one per data drop."""
+    layers = list(layers)
+    return {zoom: merge_hexagons([part[zoom] for part in layers]) for zoom in layers[0]}
+
+
+class SpatialIndex:
+    """Hexagon layers for every zoom level plus a KD-tree over the raw points.
+
+    ``layers`` can be passed in when they were already built, e.g. merged
+    from the per-drop layers of the store; only the KD-tree is built then.
+    """
+
+    def __init__(self, lat, lon, zooms=range(MIN_ZOOM, RAW_POINT_ZOOM), layers=None):
+        lat, lon = np.asarray(lat, dtype='float64'), np.asarray(lon, dtype='float64')
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        self.positions = np.flatnonzero(valid)
+        self.x, self.y = to_mercator(lat[valid], lon[valid])
+        self.tree = cKDTree(np.column_stack([self.x, self.y]))
+        if layers is None:
+            layers = {zoom: hexbin(self.x, self.y, zoom) for zoom in zooms}
+        self.layers = layers
+
+    def query(self, bounds):
+        """Row positions (in the original frame) of the points inside ``bounds``."""
+        x0, y0, x1, y1 = bounds
+        center = [(x0 + x1) / 2.0, (y0 + y1) / 2.0]
+        radius = max(x1 - x0, y1 - y0) / 2.0
+        candidates = np.asarray(self.tree.query_ball_point(center, radius, p=np.inf), dtype='int64')
+        inside = ((self.x[candidates] >= x0) & (self.x[candidates] <= x1)
+                  & (self.y[candidates] >= y0) & (self.y[candidates] <= y1))
+        return self.positions[np.sort(candidates[inside])]
+
+    def view(self, center_lat, center_lon, zoom, width=1000, height=600):
+        """What to draw for a viewport: ``('points', positions)`` or ``('hexagons', frame)``.
+
+        Raw points are only returned from ``RAW_POINT_ZOOM`` and when at most
+        ``MAX_RAW_POINTS`` fall inside the viewport, so the number of glyphs
+        stays bounded regardless of the data size.
+        """
+        bounds = viewport_bounds(center_lat, center_lon, zoom, width, height)
+        x0, y0, x1, y1 = bounds
+        if zoom in self.layers:
+            layer = self.layers[zoom]
+            inside = (layer['x'] >= x0) & (layer['x'] <= x1) & (layer['y'] >= y0) & (layer['y'] <= y1)
+            return 'hexagons', layer[inside]
+
+        positions = self.query(bounds)
+        if zoom >= RAW_POINT_ZOOM and len(positions) <= MAX_RAW_POINTS:
+            return 'points', positions
+        order = np.searchsorted(self.positions, positions)
+        return 'hexagons', hexbin(self.x[order], self.y[order], zoom)
@@ -0,0 +1,311 @@
+"""Append-only, year/month partitioned Parquet store for accident data drops.
+
+New CSV drops (yearly or monthly files) are validated and written as new
+partition files, so adding a month only parses and aggregates that month.
+Drops are parsed in chunks, so a drop does not need to fit in memory.
+
+Every parsed chunk is also kept as an uncompressed Arrow IPC file together
+with a summary (chart marginals, province stats and the coarse hexagon
+layers) and a province/date row index. The dashboard combines these
+per-chunk pieces, so a new drop never re-reads or re-aggregates the rows of
+earlier drops.
+
+Usage: python store.py [--drops data/drops] [--store data/accidents] [--watch SECONDS]
+"""
+import argparse
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aggregates import build_cube
+from drilldown import PartitionedProvinceIndex, ProvinceIndex, combine_province_stats, province_stats
+from fileio import atomic_path, dump_joblib, read_arrow_table, write_arrow, write_json
+from ingest import (
+    DATE_COLUMN, TIME_COLUMN, CATEGORY_COLUMNS, COUNT_COLUMNS,
+    file_hash, iter_accidents, load_accidents,
+)
+from spatial import MIN_ZOOM, hexagon_layers, merge_layers
+
+DROP_DIR = os.path.join("data", "drops")
+STORE_DIR = os.path.join("data", "accidents")
+# ไฟล์เดิมที่ root ของโปรเจกต์ ถือเป็น drop แรก
+LEGACY_SOURCES = ["accident2021.csv"]
+INGEST_CHUNK_ROWS = int(os.environ.get("STORE_CHUNK_ROWS", 500_000))
+# เพิ่มค่านี้เมื่อรูปแบบไฟล์ใน store เปลี่ยน store เดิมจะถูกสร้างใหม่จาก drops
+STORE_FORMAT = 5
+# ระดับซูมที่เก็บชั้นหกเหลี่ยมไว้ในสรุป จำนวนช่องของระดับเหล่านี้ขึ้นกับพื้นที่ ไม่ใช่จำนวนแถว
+# ระดับที่ละเอียดกว่านี้เกือบหนึ่งช่องต่อหนึ่งจุด จึงสร้างเฉพาะส่วนที่อยู่ในหน้าจอตอนแสดงผล
+SUMMARY_ZOOMS = range(MIN_ZOOM, 9)
+
+REQUIRED_COLUMNS = [DATE_COLUMN, TIME_COLUMN] + CATEGORY_COLUMNS + ['LATITUDE', 'LONGITUDE'] + COUNT_COLUMNS
+
+
+class ValidationError(ValueError):
+    pass
+
+
+def check_columns(path):
+    try:
+        columns = pd.read_csv(path, nrows=0).columns
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise ValidationError(f"unreadable CSV ({e})") from e
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValidationError(f"missing columns {', '.join(missing)}")
+
+
+def validate_accidents(df):
+    """Check a parsed chunk and null out coordinates that are not valid degrees.
+
+    Returns the chunk and the number of rows whose coordinates were removed;
+    those rows still count in the charts but are left off the map.
+    """
+    if df.empty:
+        raise ValidationError("no rows with a valid date and time")
+    lat = pd.to_numeric(df['LATITUDE'], errors='coerce')
+    lon = pd.to_numeric(df['LONGITUDE'], errors='coerce')
+    # พิกัดที่อ่านไม่ได้หรืออยู่นอกช่วง ไม่ทำให้ทั้ง drop ถูกปฏิเสธ
+    invalid = ((lat.isna() & df['LATITUDE'].notna()) | (lon.isna() & df['LONGITUDE'].notna())
+               | (lat < -90) | (lat > 90) | (lon < -180) | (lon > 180))
+    df = df.assign(LATITUDE=lat.mask(invalid), LONGITUDE=lon.mask(invalid))
+    return df, int(invalid.sum())
+
+
+def drop_sources(drop_dir=DROP_DIR):
+    sources = sorted(glob.glob(os.path.join(drop_dir, "*.csv")))
+    return [path for path in LEGACY_SOURCES if os.path.exists(path)] + sources
+
+
+def _manifest_path(store_dir):
+    return os.path.join(store_dir, "_manifest.json")
+
+
+def read_manifest(store_dir=STORE_DIR):
+    try:
+        with open(_manifest_path(store_dir), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"format": STORE_FORMAT, "files": {}, "rejected": {}}
+
+
+def _write_manifest(store_dir, manifest):
+    write_json(_manifest_path(store_dir), manifest, ensure_ascii=False, indent=1)
+
+
+def store_version(manifest):
+    entries = sorted((path, entry["sha256"]) for path, entry in manifest["files"].items())
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()
+
+
+def _remove_part(store_dir, part_id):
+    pattern = os.path.join(store_dir, "**", f"*-{part_id}*")
+    for path in glob.glob(pattern, recursive=True):
+        os.remove(path)
+
+
+def _write_part(store_dir, df, part_id, chunk):
+    """Write the rows, summary and province index of one parsed chunk."""
+    # ความกว้างของจำนวนเต็มเท่ากันทุกไฟล์ schema ของ dataset จึงตรงกันไม่ว่าจะอ่านไฟล์ใดก่อน
+    df = df.astype({column: 'uint16' for column in COUNT_COLUMNS})
+    name = f"part-{part_id}-{chunk:05d}"
+    for kind in ("frames", "summaries", "indexes"):
+        os.makedirs(os.path.join(store_dir, kind), exist_ok=True)
+    write_arrow(df, os.path.join(store_dir, "frames", f"{name}.arrow"))
+    dump_joblib({
+        'rows': len(df),
+        'marginals': build_cube(df).marginals(),
+        'provinces': province_stats(df),
+        'layers': hexagon_layers(df['LATITUDE'], df['LONGITUDE'], SUMMARY_ZOOMS),
+    }, os.path.join(store_dir, "summaries", f"{name}.joblib"))
+    # ดัชนีแถวมีขนาดตามจำนวนแถว จึงแยกไฟล์ไว้ และโหลดเฉพาะในโหมดที่โหลดแถวทั้งหมดเข้าหน่วยความจำ
+    dump_joblib(ProvinceIndex(df), os.path.join(store_dir, "indexes", f"{name}.joblib"))
+
+    months = df[DATE_COLUMN].dt.to_period('M')
+    for period, part in df.groupby(months, sort=True):
+        directory = os.path.join(store_dir, "data", f"year={period.year}/month={period.month:02d}")
+        os.makedirs(directory, exist_ok=True)
+        with atomic_path(os.path.join(directory, f"{name}.parquet")) as tmp_path:
+            pq.write_table(pa.Table.from_pandas(part, preserve_index=False), tmp_path)
+
+
+def ingest_file(path, sha256, store_dir=STORE_DIR, previous=None, chunk_rows=INGEST_CHUNK_ROWS):
+    """Validate one CSV drop and append it to the store as a new set of partition files.
+
+    The drop is parsed and written ``chunk_rows`` rows at a time. If any
+    chunk fails validation or cannot be parsed, the files written for this
+    drop are removed again and :class:`ValidationError` is raised. Returns
+    the number of rows and of rows whose coordinates were nulled out.
+    """
+    check_columns(path)
+    part_id = sha256[:16]
+    rows, invalid = 0, 0
+    try:
+        for chunk, df in enumerate(iter_accidents(path, chunk_rows)):
+            if df.empty:
+                continue
+            df, chunk_invalid = validate_accidents(df)
+            _write_part(store_dir, df, part_id, chunk)
+            rows += len(df)
+            invalid += chunk_invalid
+        if rows == 0:
+            raise ValidationError("no rows with a valid date and time")
+    except ValidationError:
+        _remove_part(store_dir, part_id)
+        raise
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError, OSError) as e:
+        # บรรทัดเสียหรืออ่านไฟล์ไม่ได้กลางไฟล์: ลบ chunk ที่เขียนไปแล้ว และบันทึกเป็นไฟล์ที่ถูกปฏิเสธ
+        _remove_part(store_dir, part_id)
+        raise ValidationError(f"unreadable CSV ({e})") from e
+    if previous is not None:
+        # ไฟล์เดิมถูกแก้ไข: แทนที่พาร์ทิชันของเวอร์ชันก่อนหน้า
+        _remove_part(store_dir, previous["sha256"][:16])
+    return rows, invalid
+
+
+def sync_store(sources=None, store_dir=STORE_DIR):
+    """Ingest every new or changed drop and return the store version.
+
+    Files whose mtime and size are unchanged are skipped without hashing, so
+    calling this on every dashboard rerun only costs a ``stat`` per drop.
+    """
+    sources = drop_sources() if sources is None else sources
+    os.makedirs(store_dir, exist_ok=True)
+    with open(os.path.join(store_dir, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = read_manifest(store_dir)
+        changed = False
+        if manifest.get("format") != STORE_FORMAT:
+            # store รูปแบบเก่า: ลบพาร์ทิชันทั้งหมดแล้ว ingest drops ใหม่
+            for kind in ("data", "cube", "moments", "frames", "summaries", "indexes"):
+                shutil.rmtree(os.path.join(store_dir, kind), ignore_errors=True)
+            manifest = {"format": STORE_FORMAT, "files": {}, "rejected": {}}
+            changed = True
+        for path in sources:
+            stat = os.stat(path)
+            signature = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+            # ไฟล์ที่ถูกแก้แล้วไม่ผ่านการตรวจยังมี entry เดิมใน files จึงต้องเทียบกับ rejected ก่อน
+            entries = (manifest["rejected"].get(path), manifest["files"].get(path))
+            if any(entry is not None and all(entry[key] == value for key, value in signature.items())
+                   for entry in entries):
+                continue
+
+            digest = file_hash(path)
+            previous = manifest["files"].get(path)
+            if previous is not None and previous["sha256"] == digest:
+                # เนื้อหากลับมาเหมือนเวอร์ชันที่ ingest ไว้แล้ว
+                previous.update(signature)
+                manifest["rejected"].pop(path, None)
+                changed = True
+                continue
+
+            try:
+                rows, invalid = ingest_file(path, digest, store_dir, previous)
+            except ValidationError as e:
+                manifest["rejected"][path] = dict(signature, sha256=digest, error=str(e))
+            else:
+                manifest["files"][path] = dict(signature, sha256=digest, rows=rows, invalid_coordinates=invalid)
+                manifest["rejected"].pop(path, None)
+            changed = True
+
+        if changed:
+            _write_manifest(store_dir, manifest)
+    return store_version(manifest)
+
+
+def store_parts(store_dir=STORE_DIR):
+    """Names of the per-chunk files of every ingested drop, in the row order of :func:`load_store`."""
+    part_ids = {entry["sha256"][:16] for entry in read_manifest(store_dir)["files"].values()}
+    paths = glob.glob(os.path.join(store_dir, "summaries", "part-*.joblib"))
+    names = sorted(os.path.splitext(os.path.basename(path))[0] for path in paths)
+    # ไฟล์ของ drop ที่กำลัง ingest หรือกำลังถูกแทนที่ยังไม่อยู่ใน manifest จึงไม่ถูกนับ
+    return [name for name in names if name.split("-")[1] in part_ids]
+
+
+def load_store(store_dir=STORE_DIR):
+    """Load all drops of the store as one typed frame.
+
+    The per-chunk Arrow files are memory-mapped and concatenated, so nothing
+    is parsed or decoded again when a drop is added.
+    """
+    tables = [read_arrow_table(os.path.join(store_dir, "frames", f"{name}.arrow")) for name in store_parts(store_dir)]
+    if not tables:
+        raise ValueError(f"no accident data has been ingested into {store_dir}")
+    # ขนาดของ dictionary index ต่างกันได้ในแต่ละ chunk จึงให้ pyarrow ขยาย schema ให้ตรงกันก่อนต่อ
+    return pa.concat_tables(tables, promote_options="permissive").to_pandas(split_blocks=True)
+
+
+def load_store_summary(store_dir=STORE_DIR):
+    """Combine the per-chunk summaries into the dashboard's precomputed results.
+
+    Returns a dict with the merged chart ``marginals``, province ``stats``
+    (see ``drilldown.province_stats``) and hexagon ``layers`` for
+    ``SUMMARY_ZOOMS``. The size of each summary depends on the number of
+    days, provinces and map cells, not on the number of rows.
+    """
+    summaries = [joblib.load(os.path.join(store_dir, "summaries", f"{name}.joblib"))
+                 for name in store_parts(store_dir)]
+    if not summaries:
+        raise ValueError(f"no accident data has been ingested into {store_dir}")
+    marginals = summaries[0]['marginals']
+    for summary in summaries[1:]:
+        marginals = marginals.combine(summary['marginals'])
+    return {
+        'marginals': marginals,
+        'stats': combine_province_stats(summary['provinces'] for summary in summaries),
+        'layers': merge_layers(summary['layers'] for summary in summaries),
+    }
+
+
+def load_province_index(store_dir=STORE_DIR):
+    """Province/date row index over the rows of :func:`load_store`, from the per-chunk indexes.
+
+    The index arrays are memory-mapped, so processes share them.
+    """
+    indexes = [joblib.load(os.path.join(store_dir, "indexes", f"{name}.joblib"), mmap_mode="r")
+               for name in store_parts(store_dir)]
+    offsets = np.cumsum([0] + [len(index.order) for index in indexes[:-1]])
+    return PartitionedProvinceIndex(indexes, offsets)
+
+
+def load_frame(path):
+    """Load either a single accident CSV (through the Arrow cache) or a store directory."""
+    if os.path.isdir(path):
+        return load_store(path)
+    return load_accidents(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drops", default=DROP_DIR)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--watch", type=float, default=None, help="poll the drop directory every N seconds")
+    args = parser.parse_args()
+
+    while True:
+        version = sync_store(drop_sources(args.drops), args.store)
+        manifest = read_manifest(args.store)
+        print(f"store {version[:12]}: {len(manifest['files'])} files, "
+              f"{sum(entry['rows'] for entry in manifest['files'].values())} rows, "
+              f"{len(manifest['rejected'])} rejected")
+        for path, entry in manifest["files"].items():
+            if entry.get("invalid_coordinates"):
+                print(f"  {path}: {entry['invalid_coordinates']} rows with invalid LATITUDE/LONGITUDE left off the map")
+        for path, entry in manifest["rejected"].items():
+            print(f"  rejected {path}: {entry['error']}")
+        if args.watch is None:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import joblib
+import numpy as np
+
+import instrumentation
+from features import add_time_features, classifier_pipeline, feature_names, regression_pipeline
+from fileio import dump_joblib
+from store import load_frame
+
+MODEL_CACHE_DIR = os.path.join(".cache", "models")
+SERVING_MODEL_DIR = os.path.join("Backend", "models", "artifacts")
+# จำนวนผลลัพธ์ของงาน run() ที่เก็บไว้ในหน่วยความจำ (เช่น forecast/backtest ของเวอร์ชันล่าสุด)
+JOB_RESULT_ENTRIES = int(os.environ.get("TRAINING_JOB_RESULT_ENTRIES", 16))
+
+
+def fit_regression(data_path, params):
+    from sklearn.metrics import mean_squared_error
+    from sklearn.model_selection import train_test_split
+
+    df = add_time_features(load_frame(data_path))
+    y = df['ผู้บาดเจ็บสาหัส'].astype(int) + df['ผู้บาดเจ็บเล็กน้อย'].astype(int)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        df, y, test_size=params.get('test_size', 0.2), random_state=params.get('random_state', 42))
+    model = regression_pipeline()
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    return {
+        'model': model,
+        'features': feature_names(model),
+        'mse': mean_squared_error(y_test, y_pred),
+        'y_test': y_test.to_numpy(),
+        'y_pred': y_pred,
+    }
+
+
+def fit_classifier(data_path, params):
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import train_test_split
+
+    df = add_time_features(load_frame(data_path))
+    y = np.where(df['ผู้เสียชีวิต'] > 0, 1, 0)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        df, y, test_size=params.get('test_size', 0.2), random_state=params.get('random_state', 42))
+    model = classifier_pipeline(
+        n_estimators=params.get('n_estimators', 100), random_state=params.get('random_state', 42))
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    return {
+        'model': model,
+        'features': feature_names(model),
+        'accuracy': accuracy_score(y_test, y_pred),
+        'feature_importances': model.named_steps['model'].feature_importances_,
+    }
+
+
+TRAINERS = {
+    'regression': fit_regression,
+    'classifier': fit_classifier,
+}
+
+
+def model_key(name, version, params):
+    payload = json.dumps([name, version, params], sort_keys=True, default=str)
+    return f"{name}-{hashlib.sha1(payload.encode()).hexdigest()[:16]}"
+
+
+def _train_and_save(name, data_path, params, path):
+    start = time.perf_counter()
+    artifact = TRAINERS[name](data_path, params)
+    artifact['fit_seconds'] = time.perf_counter() - start
+    dump_joblib(artifact, path)
+    return path
+
+
+class TrainingService:
+    """Fits models in a background process pool and persists them with joblib.
+
+    Artifacts are keyed by model name, data version and hyperparameters, so a
+    rerun with unchanged inputs loads the fitted model from disk (or memory)
+    instead of training again.
+    """
+
+    def __init__(self, cache_dir=MODEL_CACHE_DIR, max_workers=None, max_job_results=JOB_RESULT_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.max_job_results = max_job_results
+        self._executor = None
+        self._threads = None
+        self._futures = {}
+        self._jobs = {}
+        self._job_results = OrderedDict()
+        self._loaded = {}
+        self._published = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def submit(self, name, data_path, version, params=None):
+        """Start training unless a fitted artifact already exists. Returns the model key."""
+        params = params or {}
+        key = model_key(name, version, params)
+        with self._lock:
+            if key in self._loaded or key in self._futures or os.path.exists(self._path(key)):
+                return key
+            instrumentation.count("training_service", "miss")
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.max_workers)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._futures[key] = self._executor.submit(_train_and_save, name, data_path, params, self._path(key))
+        return key
+
+    def get(self, name, data_path, version, params=None):
+        """Return the fitted artifact, or None while it is still training.
+
+        Training errors from the worker are re-raised here.
+        """
+        key = self.submit(name, data_path, version, params)
+        if key in self._loaded:
+            instrumentation.count("training_service", "hit")
+            return self._loaded[key]
+
+        future = self._futures.get(key)
+        if future is not None:
+            if not future.done():
+                return None
+            future.result()
+        else:
+            instrumentation.count("training_service", "hit")
+
+        # memory-map อาร์เรย์ของโมเดล ทุกโปรเซสในเครื่องจึงใช้หน้าหน่วยความจำชุดเดียวกัน
+        artifact = joblib.load(self._path(key), mmap_mode="r")
+        if future is not None:
+            # การเทรนเกิดในโปรเซสลูก บันทึกเวลาที่โปรเซสลูกวัดไว้ลงสถิติของโปรเซสนี้
+            instrumentation.observe("fit", artifact['fit_seconds'])
+        with self._lock:
+            self._loaded[key] = artifact
+            self._futures.pop(key, None)
+        return artifact
+
+    def run(self, key, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` once per ``key`` in a background thread.
+
+        For work that manages its own process pool, such as ``Forecaster``.
+        Returns the result, or None while it is still running. Errors from
+        ``fn`` are re-raised here once, and the next call runs it again.
+        Only the ``max_job_results`` most recently used results are kept.
+        """
+        with self._lock:
+            if key in self._job_results:
+                self._job_results.move_to_end(key)
+                return self._job_results[key]
+            future = self._jobs.get(key)
+            if future is None:
+                if self._threads is None:
+                    self._threads = ThreadPoolExecutor(thread_name_prefix="training-service")
+                future = self._jobs[key] = self._threads.submit(fn, *args, **kwargs)
+            if not future.done():
+                return None
+            # งานที่เสร็จหรือล้มเหลวแล้วไม่ถูกเก็บไว้ งานที่ล้มเหลวจึงเริ่มใหม่ได้ในการเรียกครั้งถัดไป
+            del self._jobs[key]
+            self._job_results[key] = future.result()
+            while len(self._job_results) > self.max_job_results:
+                self._job_results.popitem(last=False)
+            return self._job_results[key]
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+        if self._threads is not None:
+            self._threads.shutdown(wait=wait, cancel_futures=True)
+
+    def publish(self, name, data_path, version, params=None, model_dir=SERVING_MODEL_DIR):
+        """Copy a fitted model to the backend's model directory, where ``POST /predict/<name>`` serves it.
+
+        Returns the published path, or None while the model is still training.
+        Publishing the same model again does not rewrite the file.
+        """
+        artifact = self.get(name, data_path, version, params)
+        if artifact is None:
+            return None
+        key = model_key(name, version, params or {})
+        path = os.path.join(model_dir, f"{name}.joblib")
+        if self._published.get(path) == key:
+            return path
+        os.makedirs(model_dir, exist_ok=True)
+        dump_joblib({
+            'model': artifact['model'],
+            'features': artifact['features'],
+            'model_key': key,
+            'data_version': version,
+            'params': params or {},
+            'fit_seconds': artifact.get('fit_seconds'),
+        }, path)
+        self._published[path] = key
+        return path